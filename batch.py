@@ -0,0 +1,149 @@
+"""
+Batch evaluation of many positions at once with NumPy(pip install numpy)
+positions are an N x cells array, cell (i, j) is column i * size + j: 1 is X, -1 is O and 0 is empty
+win lines are the same as Game.is_end and search use(bitboard.Layout.win_masks), so they can't disagree
+"""
+from math import isqrt
+
+import numpy as np
+
+import bitboard
+from perfect_table import MAGIC, PerfectPlayTable
+from tablebase import HEADER, Tablebase, load_table
+
+# status of a position, like Layout.result for X and O(ONGOING instead of None)
+X_WINS = 1
+O_WINS = -1
+DRAW = 0
+ONGOING = 2
+# value of a position without a perfect play record(not reachable or table not generated)
+UNKNOWN = -2
+# positions checked at once, bounds the memory of line sums
+BATCH_SIZE = 65536
+
+SIGNS = {'X': 1, 'O': -1}
+
+
+def from_boards(boards):
+    """
+    convert list of lists boards(Game.board) to a positions array
+    :param boards: iterable of list of lists boards of one size
+    :return: N x cells int8 array(0 x 0 if there are no boards)
+    """
+    rows = [[SIGNS.get(sign, 0) for row in board for sign in row] for board in boards]
+    if not rows:
+        return np.zeros((0, 0), dtype=np.int8)
+    return np.array(rows, dtype=np.int8)
+
+
+def board_layout(positions, k=None):
+    """
+    layout of the board of a positions array
+    :param positions: N x cells array
+    :param k: number of signs in a row to win(board size if not given)
+    :return: Layout
+    """
+    size = isqrt(positions.shape[1])
+    if size * size != positions.shape[1]:
+        raise ValueError(f'{positions.shape[1]} cells is not a square board')
+    return bitboard.layout(size, size if k is None else k)
+
+
+def status(positions, k=None, batch_size=BATCH_SIZE):
+    """
+    win, draw or ongoing of every position by sums of signs on win lines(X is checked first, like Game.is_end)
+    :param positions: N x cells array
+    :param k: number of signs in a row to win(board size if not given)
+    :param batch_size: positions checked at once
+    :return: int8 array of X_WINS, O_WINS, DRAW or ONGOING
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    if not len(positions):
+        return np.zeros(0, dtype=np.int8)
+    layout = board_layout(positions, k)
+    lines = np.array(layout.line_cells, dtype=np.intp)
+    result = np.empty(len(positions), dtype=np.int8)
+    for start in range(0, len(positions), batch_size):
+        chunk = positions[start:start + batch_size]
+        # N x lines: k is a line of X, -k a line of O
+        sums = chunk[:, lines].sum(axis=2, dtype=np.int8)
+        full = np.all(chunk != 0, axis=1)
+        result[start:start + batch_size] = np.where(
+            np.any(sums == layout.k, axis=1), X_WINS,
+            np.where(np.any(sums == -layout.k, axis=1), O_WINS, np.where(full, DRAW, ONGOING))
+        )
+    return result
+
+
+def x_to_move(positions, starter='X'):
+    """
+    player to move of every position from the number of signs
+    :param positions: N x cells array
+    :param starter: player who started the games
+    :return: bool array, True if X moves next
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    x_count = np.count_nonzero(positions == 1, axis=1)
+    o_count = np.count_nonzero(positions == -1, axis=1)
+    return x_count == o_count if starter == 'X' else x_count < o_count
+
+
+def values(positions, to_move=None, k=None, table=None):
+    """
+    perfect play values of every position by lookups in the perfect play table(3x3) or a tablebase
+    :param positions: N x cells array
+    :param to_move: bool array, True if X moves next(X starter is assumed if not given)
+    :param k: number of signs in a row to win(board size if not given)
+    :param table: PerfectPlayTable or Tablebase(the table of the board if not given)
+    :return: int8 array of values for the player to move(1 win, 0 draw, -1 loss or UNKNOWN),
+             int8 array of distances to result
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    if not len(positions):
+        return np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int8)
+    layout = board_layout(positions, k)
+    to_move = x_to_move(positions) if to_move is None else np.asarray(to_move, dtype=bool)
+    if table is None:
+        table = load_table(layout)
+    if table is None:
+        unknown = np.full(len(positions), UNKNOWN, dtype=np.int8)
+        return unknown, np.zeros(len(positions), dtype=np.int8)
+    pow3 = 3 ** np.arange(layout.cells, dtype=np.int64)
+    if isinstance(table, PerfectPlayTable):
+        # digit 1 is X and 2 is O, X to move and O to move records are next to each other
+        digits = np.where(positions == 1, 1, np.where(positions == -1, 2, 0))
+        indexes = 2 * (digits @ pow3) + ~to_move
+        records = np.frombuffer(table.data, dtype='<u2', offset=len(MAGIC))[indexes]
+        distances = records >> 2 & 15
+        valid = np.ones(len(positions), dtype=bool)
+    elif isinstance(table, Tablebase):
+        # digit 1 is the player to move and 2 the other player
+        mine = np.where(to_move, 1, -1)[:, None]
+        digits = np.where(positions == 0, 0, np.where(positions == mine, 1, 2))
+        records = np.frombuffer(table.data, dtype=np.uint8, offset=HEADER)[digits @ pow3]
+        distances = records >> 2
+        # other player has as many signs as the player to move or one more
+        counts = np.count_nonzero(digits == 2, axis=1) - np.count_nonzero(digits == 1, axis=1)
+        valid = (counts == 0) | (counts == 1)
+    else:
+        raise TypeError('table must be a PerfectPlayTable or a Tablebase')
+    # LOSS, DRAW and WIN records are 1, 2 and 3, not reachable positions 0
+    result = np.where(valid, (records & 3).astype(np.int8) - 2, UNKNOWN).astype(np.int8)
+    return result, np.where(result == UNKNOWN, 0, distances).astype(np.int8)
+
+
+def evaluate(positions, k=None, perfect=False, to_move=None, table=None):
+    """
+    status of every position and optionally its perfect play value
+    :param positions: N x cells array
+    :param k: number of signs in a row to win(board size if not given)
+    :param perfect: also look up perfect play values
+    :param to_move: bool array, True if X moves next(X starter is assumed if not given)
+    :param table: PerfectPlayTable or Tablebase(the table of the board if not given)
+    :return: status array, or status, values and distances arrays if perfect is True
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    result = status(positions, k)
+    if not perfect:
+        return result
+    return (result,) + values(positions, to_move, k, table)
@@ -0,0 +1,355 @@
+"""
+Benchmark suite of the search engines over a fixed corpus of positions
+run: python benchmark.py [--repeat 5] [--warmup 1] [--json results.json]
+positions are searched with search.best_move directly, so the random first move of Game never happens
+and every run searches exactly the same trees
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+from game import Game
+from ordering import MoveOrdering
+from parallel import RootSplitter
+from shared_table import SharedTranspositionTable
+from search import Position, best_move
+from tablebase import load_table
+from transposition import TranspositionTable
+
+try:
+    import numpy as np
+
+    import batch
+except ImportError:
+    # batch evaluation needs NumPy, its benchmark is skipped without it
+    batch = None
+
+# name, board rows, win length, player to move, max_depth(None searches the whole tree)
+CORPUS = [
+    ('3x3-corner', ['X..', '...', '...'], 3, 'O', None),
+    ('3x3-center', ['...', '.X.', '...'], 3, 'O', None),
+    ('3x3-mid', ['XO.', '.X.', '...'], 3, 'O', None),
+    ('3x3-near-end', ['XOX', 'OO.', 'X..'], 3, 'X', None),
+    ('4x4-corner-d6', ['X...', '....', '....', '....'], 4, 'O', 6),
+    ('5x5-center-d4', ['.....', '.....', '..X..', '.....', '.....'], 4, 'O', 4),
+    ('7x7-center-d3', ['.......'] * 3 + ['...X...'] + ['.......'] * 3, 5, 'O', 3),
+]
+
+# engine name: best_move arguments(table and ordering are created fresh for every run, table is the hashing,
+# evaluator False scores positions at the horizon as draws, iterative searches with an explicit stack)
+ENGINES = {
+    'minimax': dict(prune=False, table=None, ordering=False, evaluator=True, iterative=False),
+    'minimax+iterative': dict(prune=False, table=None, ordering=False, evaluator=True, iterative=True),
+    'minimax+table': dict(prune=False, table='zobrist', ordering=False, evaluator=True, iterative=False),
+    'alpha-beta': dict(prune=True, table=None, ordering=False, evaluator=True, iterative=False),
+    'alpha-beta+iterative': dict(prune=True, table=None, ordering=False, evaluator=True, iterative=True),
+    'alpha-beta+table': dict(prune=True, table='zobrist', ordering=False, evaluator=True, iterative=False),
+    'alpha-beta+canonical+ordering': dict(
+        prune=True, table='canonical', ordering=True, evaluator=True, iterative=False
+    ),
+    'alpha-beta+table+ordering': dict(prune=True, table='zobrist', ordering=True, evaluator=True, iterative=False),
+    'alpha-beta+table+ordering+iterative': dict(
+        prune=True, table='zobrist', ordering=True, evaluator=True, iterative=True
+    ),
+    'alpha-beta+table+ordering-eval': dict(
+        prune=True, table='zobrist', ordering=True, evaluator=False, iterative=False
+    ),
+}
+
+# board size, win length and number of random positions of batch evaluation, positions checked one at a time
+BATCH_BOARDS = [(3, 3, 1000000, 20000), (4, 4, 1000000, 20000), (7, 5, 200000, 5000)]
+
+# corpus positions searched in parallel with every number of workers
+PARALLEL_POSITIONS = ['3x3-corner', '4x4-corner-d6', '5x5-center-d4']
+PARALLEL_WORKERS = [1, 2, 4, 8]
+
+# move ordering configurations, each one adds a heuristic to the previous one
+ORDERINGS = [
+    ('row-major', None),
+    ('priors', dict(hash_move=False, killers=False, history=False)),
+    ('+hash move', dict(killers=False, history=False)),
+    ('+killers', dict()),
+    ('+history', dict(history=True)),
+]
+
+
+def corpus_position(rows, k):
+    """
+    build position of a corpus entry
+    :param rows: board rows as strings
+    :param k: win length
+    :return: Position
+    """
+    return Position.from_board([list(row) for row in rows], k)
+
+
+def run_once(position, player, max_depth, engine):
+    """
+    one search of a position
+    :param position: Position
+    :param player: player to move
+    :param max_depth: maximum depth algorithm would traverse
+    :param engine: ENGINES arguments
+    :return: SearchResult, wall time in seconds
+    """
+    layout = position.layout
+    table = TranspositionTable(layout, hashing=engine['table']) if engine['table'] else None
+    ordering = MoveOrdering(layout) if engine['ordering'] else None
+    start = time.perf_counter()
+    result = best_move(
+        position, player, max_depth=max_depth, prune=engine['prune'], table=table, ordering=ordering,
+        evaluator=engine['evaluator'], iterative=engine['iterative']
+    )
+    return result, time.perf_counter() - start
+
+
+def bench(name, rows, k, player, max_depth, engine, repeat, warmup):
+    """
+    search a corpus position with an engine several times
+    :param name: position name
+    :param rows: board rows
+    :param k: win length
+    :param player: player to move
+    :param max_depth: maximum depth algorithm would traverse
+    :param engine: engine name
+    :param repeat: measured runs
+    :param warmup: runs before measuring
+    :return: dict of results
+    """
+    position = corpus_position(rows, k)
+    for _ in range(warmup):
+        run_once(position, player, max_depth, ENGINES[engine])
+    times = []
+    result = None
+    for _ in range(repeat):
+        result, elapsed = run_once(position, player, max_depth, ENGINES[engine])
+        times.append(elapsed)
+    median = statistics.median(times)
+    return {
+        'position': name,
+        'engine': engine,
+        'score': result.score,
+        'move': list(result.move),
+        'nodes': result.stats['nodes'],
+        'cutoffs': result.stats['cutoffs'],
+        'median_s': median,
+        'min_s': min(times),
+        'nodes_per_s': result.stats['nodes'] / median if median else 0.0,
+    }
+
+
+def bench_ordering(ordering, rows, k, player, max_depth):
+    """
+    search a corpus position with iterative deepening alpha-beta and a move ordering
+    :param ordering: MoveOrdering arguments or None for row-major order
+    :param rows: board rows
+    :param k: win length
+    :param player: player to move
+    :param max_depth: deepest iteration
+    :return: nodes searched
+    """
+    position = corpus_position(rows, k)
+    layout = position.layout
+    result = best_move(
+        position, player, budget=3600, max_depth=max_depth, table=TranspositionTable(layout),
+        ordering=None if ordering is None else MoveOrdering(layout, **ordering)
+    )
+    return result.stats['nodes']
+
+
+def bench_parallel(name, workers, repeat, shared=False):
+    """
+    search a corpus position with root moves split between worker processes(tables are empty in every run)
+    :param name: corpus position name
+    :param workers: number of processes
+    :param repeat: measured runs
+    :param shared: workers use one table in shared memory instead of their own tables
+    :return: dict of timings, table hits and whether the move is the same as a serial search
+    """
+    _, rows, k, player, max_depth = next(entry for entry in CORPUS if entry[0] == name)
+    position = corpus_position(rows, k)
+    serial = best_move(position, player, max_depth=max_depth, table=TranspositionTable(position.layout))
+    table = SharedTranspositionTable(position.layout) if shared else None
+    splitter = RootSplitter(workers, table=table)
+    try:
+        # first search starts the worker processes
+        splitter.best_move(position, player, max_depth, keep_tables=False)
+        times = []
+        for _ in range(repeat):
+            result = splitter.best_move(position, player, max_depth, keep_tables=False)
+            times.append(result.stats['elapsed'])
+    finally:
+        splitter.close()
+        if table is not None:
+            table.close()
+    return {
+        'position': name,
+        'workers': workers,
+        'shared': shared,
+        'nodes': result.stats['nodes'],
+        'table_hits': result.stats['table_hits'],
+        'table_cross_hits': result.stats['table_cross_hits'],
+        'median_s': statistics.median(times),
+        'same_move': result.move == serial.move,
+    }
+
+
+def bench_batch(size, k, count, single, seed=0):
+    """
+    throughput of batch evaluation of random positions against Game.is_end one board at a time
+    :param size: board size
+    :param k: win length
+    :param count: positions of batch evaluation
+    :param single: positions checked with Game.is_end
+    :param seed: seed of random positions
+    :return: dict of positions per second
+    """
+    rng = np.random.default_rng(seed)
+    positions = rng.integers(-1, 2, size=(count, size * size), dtype=np.int8)
+    start = time.perf_counter()
+    batch.status(positions, k)
+    status_rate = count / (time.perf_counter() - start)
+
+    signs = {1: 'X', -1: 'O', 0: '.'}
+    boards = [[[signs[v] for v in row[i * size:(i + 1) * size]] for i in range(size)] for row in positions[:single]]
+    # games are set up(and their line counters built) before timing, only is_end is measured
+    games = []
+    for board in boards:
+        game = Game(size=size, k=k)
+        game.board = board
+        games.append(game)
+    start = time.perf_counter()
+    for game in games:
+        game.is_end()
+    single_rate = single / (time.perf_counter() - start)
+
+    lookup_rate = None
+    table = load_table(batch.board_layout(positions, k))
+    if table is not None:
+        start = time.perf_counter()
+        batch.values(positions, table=table)
+        lookup_rate = count / (time.perf_counter() - start)
+    return {
+        'board': f'{size}x{size}',
+        'k': k,
+        'positions': count,
+        'status_per_s': status_rate,
+        'is_end_per_s': single_rate,
+        'lookup_per_s': lookup_rate,
+    }
+
+
+def _commit():
+    """
+    current git commit, so results of different commits can be told apart
+    :return: commit hash or None
+    """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat=5, warmup=1):
+    """
+    run the whole suite
+    :param repeat: measured runs of every search
+    :param warmup: runs before measuring
+    :return: dict of results
+    """
+    results = []
+    for name, rows, k, player, max_depth in CORPUS:
+        for engine in ENGINES:
+            # minimax without a table can't search larger boards in a reasonable time
+            if len(rows) > 3 and not ENGINES[engine]['prune'] and not ENGINES[engine]['table']:
+                continue
+            results.append(bench(name, rows, k, player, max_depth, engine, repeat, warmup))
+    ordering = []
+    for order_name, arguments in ORDERINGS:
+        ordering.append({
+            'ordering': order_name,
+            'nodes': {
+                name: bench_ordering(arguments, rows, k, player, max_depth)
+                for name, rows, k, player, max_depth in CORPUS
+            },
+        })
+    parallel = [
+        bench_parallel(name, workers, repeat, shared)
+        for name in PARALLEL_POSITIONS for shared in (False, True) for workers in PARALLEL_WORKERS
+    ]
+    batch_results = None
+    if batch is not None:
+        batch_results = [bench_batch(*board) for board in BATCH_BOARDS]
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'warmup': warmup,
+        'results': results,
+        'ordering': ordering,
+        'parallel': parallel,
+        'batch': batch_results,
+    }
+
+
+def print_report(report):
+    """
+    print benchmark tables
+    :param report: dict returned by run
+    :return:
+    """
+    print(f"{'Position':<16}{'Engine':<38}{'Nodes':>10}{'Cutoffs':>10}{'Median':>11}{'Nodes/s':>12}")
+    for r in report['results']:
+        print(
+            f"{r['position']:<16}{r['engine']:<38}{r['nodes']:>10}{r['cutoffs']:>10}"
+            f"{r['median_s']:>10.4f}s{int(r['nodes_per_s']):>12}"
+        )
+    print()
+    names = [name for name, *_ in CORPUS]
+    print(f"{'Ordering':<12}" + ''.join(f'{name:>16}' for name in names))
+    for row in report['ordering']:
+        print(f"{row['ordering']:<12}" + ''.join(f"{row['nodes'][name]:>16}" for name in names))
+    print()
+    print(
+        f"{'Position':<16}{'Table':<8}{'Workers':>8}{'Nodes':>10}{'Hits':>8}{'Cross hits':>12}{'Median':>11}"
+        f"{'Speedup':>9}{'Same move':>11}"
+    )
+    for r in report['parallel']:
+        single = next(
+            p for p in report['parallel']
+            if p['position'] == r['position'] and p['shared'] == r['shared'] and p['workers'] == 1
+        )
+        print(
+            f"{r['position']:<16}{'shared' if r['shared'] else 'own':<8}{r['workers']:>8}{r['nodes']:>10}"
+            f"{r['table_hits']:>8}{r['table_cross_hits']:>12}{r['median_s']:>10.4f}s"
+            f"{single['median_s'] / r['median_s']:>8.2f}x{'yes' if r['same_move'] else 'no':>11}"
+        )
+    print()
+    if report['batch'] is None:
+        print('Batch evaluation skipped(NumPy is not installed)')
+        return
+    print(f"{'Board':<12}{'Positions':>12}{'Status/s':>14}{'is_end/s':>14}{'Lookup/s':>14}")
+    for r in report['batch']:
+        lookup = f"{int(r['lookup_per_s']):>14}" if r['lookup_per_s'] is not None else f"{'-':>14}"
+        print(
+            f"{r['board'] + '(' + str(r['k']) + ')':<12}{r['positions']:>12}{int(r['status_per_s']):>14}"
+            f"{int(r['is_end_per_s']):>14}" + lookup
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="search benchmark")
+    parser.add_argument('--repeat', type=int, default=5, help="measured runs of every search")
+    parser.add_argument('--warmup', type=int, default=1, help="runs before measuring")
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON")
+    args = parser.parse_args()
+    benchmark = run(args.repeat, args.warmup)
+    print_report(benchmark)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(benchmark, f, indent=2, sort_keys=True)
@@ -0,0 +1,192 @@
+"""
+Bitboard representation of the board used in the search hot path
+each player owns an integer mask, cell (i, j) is bit i * size + j
+"""
+from functools import lru_cache
+
+
+def symmetries(size):
+    """
+    compute the 8 rotations/reflections of a square board as cell index permutations
+    :param size: board size
+    :return: list of tuples, permutation[i] is the cell that moves to index i
+    """
+    cells = [(i, j) for i in range(size) for j in range(size)]
+    last = size - 1
+    transforms = [
+        lambda i, j: (i, j),
+        lambda i, j: (j, last - i),
+        lambda i, j: (last - i, last - j),
+        lambda i, j: (last - j, i),
+        lambda i, j: (i, last - j),
+        lambda i, j: (last - i, j),
+        lambda i, j: (j, i),
+        lambda i, j: (last - j, last - i),
+    ]
+    return [tuple(a * size + b for a, b in (t(i, j) for i, j in cells)) for t in transforms]
+
+
+class Layout:
+    def __init__(self, size=3, k=3):
+        """
+        precompute line and symmetry tables of a size x size board with k in a row to win
+        :param size: board size
+        :param k: win length
+        """
+        if not 1 <= k <= size:
+            raise ValueError(f'win length must be between 1 and {size}')
+        self.size = size
+        self.k = k
+        self.cells = size * size
+        # all cells occupied
+        self.full = (1 << self.cells) - 1
+
+        # every k cells in a row: horizontal, vertical, main diagonal and second diagonal directions
+        masks = []
+        for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            for i in range(size):
+                for j in range(size):
+                    end_i = i + di * (k - 1)
+                    end_j = j + dj * (k - 1)
+                    if 0 <= end_i < size and 0 <= end_j < size:
+                        mask = 0
+                        for step in range(k):
+                            mask |= 1 << ((i + di * step) * size + j + dj * step)
+                        masks.append(mask)
+        self.win_masks = tuple(masks)
+        # cell indexes of every win line, in win_masks order
+        self.line_cells = tuple(
+            tuple(cell for cell in range(self.cells) if mask >> cell & 1) for mask in self.win_masks
+        )
+        # win masks every cell is part of
+        self.lines_through = tuple(
+            tuple(mask for mask in self.win_masks if mask >> cell & 1) for cell in range(self.cells)
+        )
+        # indexes(into win_masks) of lines every cell is part of, used by per-line counters
+        self.line_ids = tuple(
+            tuple(i for i, mask in enumerate(self.win_masks) if mask >> cell & 1) for cell in range(self.cells)
+        )
+
+        # symmetries are applied a chunk of cells at a time(whole board if it's small):
+        # _symmetry_tables[s][c][bits] is transformed mask of bits in chunk c
+        self.symmetries = symmetries(size)
+        self._chunk = self.cells if self.cells <= 12 else 8
+        self._symmetry_tables = []
+        # targets[s][cell] is where cell moves to(inverse of symmetries[s])
+        self.targets = []
+        for perm in self.symmetries:
+            target = [0] * self.cells
+            for i, p in enumerate(perm):
+                target[p] = i
+            self.targets.append(tuple(target))
+            chunks = []
+            for c in range(0, self.cells, self._chunk):
+                table = []
+                for bits in range(1 << self._chunk):
+                    transformed = 0
+                    for b in range(self._chunk):
+                        if bits >> b & 1 and c + b < self.cells:
+                            transformed |= 1 << target[c + b]
+                    table.append(transformed)
+                chunks.append(table)
+            self._symmetry_tables.append(chunks)
+
+    def from_board(self, board, first, second):
+        """
+        convert list of lists board to bitboards
+        :param board: list of lists board
+        :param first: player of the first mask
+        :param second: player of the second mask
+        :return: first player mask, second player mask
+        """
+        first_bits = 0
+        second_bits = 0
+        for i in range(self.size):
+            for j in range(self.size):
+                if board[i][j] == first:
+                    first_bits |= 1 << (i * self.size + j)
+                elif board[i][j] == second:
+                    second_bits |= 1 << (i * self.size + j)
+        return first_bits, second_bits
+
+    def result(self, first_bits, second_bits):
+        """
+        check if game has ended(bitboard version of Game.is_end)
+        :param first_bits: first player mask
+        :param second_bits: second player mask
+        :return: 1 if first player wins, -1 if second player wins, 0 if it's a draw, None otherwise
+        """
+        for mask in self.win_masks:
+            if first_bits & mask == mask:
+                return 1
+            if second_bits & mask == mask:
+                return -1
+        if first_bits | second_bits == self.full:
+            return 0
+        return None
+
+    def wins(self, bits, cell):
+        """
+        check if the player who has just taken cell made a line(only lines through cell are checked)
+        :param bits: player mask
+        :param cell: last move cell index
+        :return: True if player wins
+        """
+        for mask in self.lines_through[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def transform(self, bits, symmetry):
+        """
+        apply a symmetry to a player mask
+        :param bits: player mask
+        :param symmetry: index of symmetry(0 is identity)
+        :return: transformed mask
+        """
+        chunk = self._chunk
+        low = (1 << chunk) - 1
+        transformed = 0
+        for table in self._symmetry_tables[symmetry]:
+            transformed |= table[bits & low]
+            bits >>= chunk
+        return transformed
+
+    def canonical(self, first_bits, second_bits):
+        """
+        canonical form of a position, the same for all its rotations and reflections
+        :param first_bits: first player mask
+        :param second_bits: second player mask
+        :return: int, index of symmetry that maps position to its canonical form
+        """
+        cells = self.cells
+        chunk = self._chunk
+        low = (1 << chunk) - 1
+        best = None
+        best_symmetry = 0
+        for symmetry, tables in enumerate(self._symmetry_tables):
+            first = 0
+            second = 0
+            a = first_bits
+            b = second_bits
+            for table in tables:
+                first |= table[a & low]
+                second |= table[b & low]
+                a >>= chunk
+                b >>= chunk
+            key = first << cells | second
+            if best is None or key < best:
+                best = key
+                best_symmetry = symmetry
+        return best, best_symmetry
+
+
+@lru_cache(maxsize=None)
+def layout(size=3, k=3):
+    """
+    shared layout of a board, tables are built once per size and win length
+    :param size: board size
+    :param k: win length
+    :return: Layout
+    """
+    return Layout(size, k)
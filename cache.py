@@ -0,0 +1,130 @@
+"""
+Persistent cache of searched positions, transposition table entries are kept in an SQLite file across runs
+a table is filled from the file when a game starts and its new entries are written back in batches
+"""
+import os
+import sqlite3
+
+import evaluation
+import zobrist
+
+# default cache file, next to this module
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'positions.sqlite')
+# format of stored rows
+FORMAT = 1
+# entries of other versions are discarded: values depend on keys and evaluation
+VERSION = f'{FORMAT}:{zobrist.SEED}:{evaluation.VERSION}'
+
+
+def _signed(key):
+    """
+    64 bit key as SQLite integer
+    :param key: unsigned key
+    :return: signed key
+    """
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def _unsigned(key):
+    """
+    SQLite integer as 64 bit key
+    :param key: signed key
+    :return: unsigned key
+    """
+    return key + (1 << 64) if key < 0 else key
+
+
+class PositionCache:
+    def __init__(self, path=PATH, max_entries=1000000, batch_size=5000, version=VERSION):
+        """
+        open(or create) a cache file, entries of another version are deleted
+        :param path: cache file
+        :param max_entries: entries kept in the file, the shallowest are deleted first
+        :param batch_size: new entries collected before save writes them
+        :param version: version of stored values
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, timeout=30)
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS positions ('
+                'size INTEGER, k INTEGER, key INTEGER, remaining INTEGER, value REAL, flag INTEGER, move INTEGER, '
+                'PRIMARY KEY (size, k, key))'
+            )
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != version:
+                # stale values
+                self.connection.execute('DELETE FROM positions')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def load(self, table):
+        """
+        fill a transposition table with cached entries of its board(deepest first, up to its size) and start
+        collecting its new entries
+        :param table: TranspositionTable or SharedTranspositionTable with zobrist hashing
+        :return: number of loaded entries
+        """
+        if table.zobrist is None:
+            raise ValueError('only tables with zobrist hashing can be cached')
+        layout = table.layout
+        rows = self.connection.execute(
+            'SELECT key, remaining, value, flag, move FROM positions WHERE size = ? AND k = ? '
+            'ORDER BY remaining DESC LIMIT ?',
+            (layout.size, layout.k, table.max_size)
+        ).fetchall()
+        # shallowest first, a deeper entry replaces one it collides with in a shared table
+        for key, remaining, value, flag, move in reversed(rows):
+            # whole numbers are results of finished games, keep them as ints like search does
+            table.store(_unsigned(key), remaining, int(value) if value.is_integer() else value, flag, move)
+        table.track()
+        return len(rows)
+
+    def save(self, table, force=True):
+        """
+        write new and updated entries of a table in one transaction, then trim the file to max_entries
+        a table that doesn't collect its stored keys(shared between processes) is written whole, only when forced
+        :param table: table passed to load
+        :param force: write even if fewer than batch_size entries are collected
+        :return: number of written entries
+        """
+        dirty = table.dirty
+        if dirty is None:
+            if not force:
+                return 0
+            entries = table.items()
+        else:
+            if not dirty or (not force and len(dirty) < self.batch_size):
+                return 0
+            # evicted keys are skipped
+            entries = list(table.items(dirty))
+            dirty.clear()
+        layout = table.layout
+        rows = [(layout.size, layout.k, _signed(key)) + entry for key, entry in entries]
+        with self.connection:
+            # a deeper cached result isn't replaced, like in the table
+            self.connection.executemany(
+                'INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (size, k, key) DO UPDATE SET '
+                'remaining = excluded.remaining, value = excluded.value, flag = excluded.flag, move = excluded.move '
+                'WHERE excluded.remaining >= positions.remaining',
+                rows
+            )
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    'DELETE FROM positions WHERE rowid IN (SELECT rowid FROM positions ORDER BY remaining LIMIT ?)',
+                    (excess,)
+                )
+        return len(rows)
+
+    def close(self):
+        """
+        close cache file
+        :return:
+        """
+        self.connection.close()
@@ -0,0 +1,122 @@
+"""
+Static evaluation of unfinished positions at the search horizon
+values are strictly between -1 and 1, finished games keep -1(loss), 0(draw) and 1(win)
+"""
+from functools import lru_cache
+
+# bump when evaluation changes, persistent caches of searched values of older versions are discarded
+VERSION = 1
+
+
+class Evaluator:
+    def __init__(self, layout, line_weight=4, center_weight=0.25, threat_value=0.9, fork_value=0.8, bound=0.5):
+        """
+        precompute weights of a board
+        :param layout: board layout
+        :param line_weight: an open line(no opponent's sign on it) with c signs is worth line_weight ** (c - 1)
+        :param center_weight: a sign is worth center_weight for every win line through its field
+        :param threat_value: value of a position whose player to move has an open line missing one sign(it wins)
+        :param fork_value: value(negated) of a position whose opponent has two such lines(only one can be blocked)
+        :param bound: other positions are squashed into (-bound, bound), below forks and threats
+        """
+        self.layout = layout
+        self.weights = [0] + [line_weight ** (count - 1) for count in range(1, layout.k + 1)]
+        self.center = [center_weight * len(lines) for lines in layout.lines_through]
+        self.threat_value = threat_value
+        self.fork_value = fork_value
+        self.bound = bound
+        # score where value is half of bound: a line missing one sign(3x3: two signs in a row)
+        self.scale = self.weights[layout.k - 1] if layout.k > 1 else 1
+
+    def features(self, me, opp):
+        """
+        features of a position from scratch(search updates them with play)
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :return: score(open lines and center, player to move minus opponent), threats of player to move,
+                 threats of opponent(open lines missing one sign)
+        """
+        layout = self.layout
+        weights = self.weights
+        threat = layout.k - 1
+        score = 0
+        mine = 0
+        theirs = 0
+        for mask in layout.win_masks:
+            a = me & mask
+            b = opp & mask
+            if a and not b:
+                count = a.bit_count()
+                score += weights[count]
+                mine += count == threat
+            elif b and not a:
+                count = b.bit_count()
+                score -= weights[count]
+                theirs += count == threat
+        for cell in range(layout.cells):
+            if me >> cell & 1:
+                score += self.center[cell]
+            elif opp >> cell & 1:
+                score -= self.center[cell]
+        return score, mine, theirs
+
+    def play(self, features, me, opp, cell):
+        """
+        features after a move, only lines through the new sign change
+        :param features: features of the position
+        :param me: mask of player to move(before the move)
+        :param opp: mask of the other player
+        :param cell: move cell index
+        :return: features of the new position(for the opponent, who moves next)
+        """
+        score, mine, theirs = features
+        weights = self.weights
+        threat = self.layout.k - 1
+        for mask in self.layout.lines_through[cell]:
+            b = opp & mask
+            if b:
+                # opponent's open line is blocked
+                if not me & mask:
+                    count = b.bit_count()
+                    score += weights[count]
+                    theirs -= count == threat
+            else:
+                count = (me & mask).bit_count()
+                score += weights[count + 1] - weights[count]
+                mine += (count + 1 == threat) - (count == threat)
+        score += self.center[cell]
+        return -score, theirs, mine
+
+    def value(self, features):
+        """
+        value of an unfinished position for the player to move
+        :param features: features of the position
+        :return: value strictly between -1 and 1
+        """
+        score, mine, theirs = features
+        # a line can be completed right now
+        if mine:
+            return self.threat_value
+        # two lines are about to be completed, only one can be blocked
+        if theirs > 1:
+            return -self.fork_value
+        return self.bound * score / (abs(score) + self.scale)
+
+    def evaluate(self, me, opp):
+        """
+        value of an unfinished position
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :return: value strictly between -1 and 1
+        """
+        return self.value(self.features(me, opp))
+
+
+@lru_cache(maxsize=None)
+def evaluator(layout):
+    """
+    shared default evaluator of a board layout
+    :param layout: Layout
+    :return: Evaluator
+    """
+    return Evaluator(layout)
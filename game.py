@@ -1,22 +1,95 @@
+import atexit
 import sys
 import time
-from random import randint
+from random import choice
+
+import bitboard
+from cache import PositionCache
+from mcts import MCTS
+from ordering import MoveOrdering
+from parallel import RootSplitter
+from ponder import Ponderer
+from perfect_table import DRAW
+from search import Position, SearchResult, analyse, best_move, choose
+from shared_table import SharedTranspositionTable
+from tablebase import load_table
+from transposition import TranspositionTable
+
+# max_depth of (Hard, Easy) levels for every board size
+# the whole tree is searched on 3x3, larger boards take about a second per move at most
+MINIMAX_LEVELS = {3: (999, 3), 4: (5, 2), 5: (3, 2), 6: (3, 1), 7: (2, 1)}
+ALPHA_BETA_LEVELS = {3: (999, 3), 4: (9, 3), 5: (6, 3), 6: (5, 2), 7: (5, 2)}
+# seconds to search of (Hard, Easy) MCTS levels for every board size
+MCTS_LEVELS = {3: (1.0, 0.05), 4: (2.0, 0.1), 5: (2.0, 0.2), 6: (3.0, 0.3), 7: (3.0, 0.3)}
 
 
 class Game:
-    def __init__(self, turn='X'):
+    def __init__(self, turn='X', size=3, k=None):
         """
         initialize games board and player turn
         :param turn: could be X or O
-        """
-        self.board = [
-            ['.', '.', '.'],
-            ['.', '.', '.'],
-            ['.', '.', '.']
-        ]
+        :param size: board is size x size
+        :param k: number of signs in a row to win(size if not given)
+        """
+        self.size = size
+        self.k = size if k is None else k
+        # precomputed win lines and symmetries of this board
+        self.layout = bitboard.layout(self.size, self.k)
+        # signs on board, read through board and changed by make_move and unmake_move
+        self._board = [['.'] * size for _ in range(size)]
+        # signs of every player on every win line and number of lines each player has completed,
+        # kept by make_move and unmake_move so is_end doesn't scan the board
+        self.line_counts = {'X': [0] * len(self.layout.win_masks), 'O': [0] * len(self.layout.win_masks)}
+        self.completed_lines = {'X': 0, 'O': 0}
+        # signs on board
+        self.moves = 0
         self.turn = turn
         # use to reset turn
         self.game_starter = turn
+        # searched positions shared by all searches of this game(None disables it)
+        self.transposition_table = TranspositionTable(self.layout)
+        # move ordering heuristics of alpha-beta(None searches fields in row-major order)
+        self.move_ordering = MoveOrdering(self.layout)
+        # nodes visited by the last search
+        self.nodes = 0
+        # perfect play table(tablebase on boards other than 3x3), loaded on first use
+        self.perfect_table = None
+        # Monte Carlo tree kept between moves of this game, created on first use
+        self.mcts = None
+        # background search of AI replies during human turns, created on first use
+        self.ponderer = None
+        # persistent cache of searched positions, see use_cache
+        self.cache = None
+        # alpha-beta searches split root moves between worker processes, see use_workers
+        self.splitter = None
+        # choice among equally good moves of alpha-beta and minimax searches of the whole tree(see search.choose),
+        # None returns the move a single search finds first
+        self.tie_break = 'random'
+        # deepest max_depth finished by the last search
+        self.completed_depth = None
+        # counters of the last search(see search.search_stats), set instrument to get per-depth counters too
+        self.stats = {}
+        self.instrument = False
+
+    @property
+    def board(self):
+        """
+        current board, rows are tuples so fields can't be changed without updating line counters
+        :return: tuple of rows
+        """
+        return tuple(tuple(row) for row in self._board)
+
+    @board.setter
+    def board(self, board):
+        """
+        replace whole board and rebuild line counters
+        :param board: list of lists board of this size
+        :return:
+        """
+        if len(board) != self.size or any(len(row) != self.size for row in board):
+            raise ValueError(f'board must be {self.size} x {self.size}')
+        self._board = [list(row) for row in board]
+        self._recount()
 
     def __str__(self):
         """
@@ -24,9 +97,9 @@ class Game:
         :return:
         """
         game_str = ""
-        for i in range(3):
-            for j in range(3):
-                game_str += f"{self.board[i][j]} "
+        for i in range(self.size):
+            for j in range(self.size):
+                game_str += f"{self._board[i][j]} "
             game_str += '\n'
         # remove last \n
         game_str = list(game_str)[0:-2]
@@ -37,9 +110,9 @@ class Game:
         draw current board status
         :return:
         """
-        for i in range(3):
-            for j in range(3):
-                print(f'{self.board[i][j]}', end=" ")
+        for i in range(self.size):
+            for j in range(self.size):
+                print(f'{self._board[i][j]}', end=" ")
             print()
         print('-'*20)
 
@@ -48,22 +121,79 @@ class Game:
         check if board is empty or not
         :return: True if empty
         """
-        if self.board == [
-            ['.', '.', '.'],
-            ['.', '.', '.'],
-            ['.', '.', '.']
-        ]:
-            return True
-        return False
+        for row in self._board:
+            for field in row:
+                if field != '.':
+                    return False
+        return True
 
     def reset_board(self):
         """
         reset board to initial state
         :return:
         """
-        for i in range(3):
-            for j in range(3):
-                self.board[i][j] = '.'
+        for i in range(self.size):
+            for j in range(self.size):
+                self._board[i][j] = '.'
+        self._recount()
+
+    def _recount(self):
+        """
+        rebuild line counters of current board
+        :return:
+        """
+        for player in ('X', 'O'):
+            counts = self.line_counts[player]
+            for i in range(len(counts)):
+                counts[i] = 0
+            self.completed_lines[player] = 0
+        self.moves = 0
+        for i in range(self.size):
+            for j in range(self.size):
+                player = self._board[i][j]
+                if player != '.':
+                    # counted again as a new move
+                    self._board[i][j] = '.'
+                    self.make_move(i, j, player)
+
+    def make_move(self, x, y, player):
+        """
+        put a sign on board and update counters of the lines through it
+        :param x: coordinate
+        :param y: coordinate
+        :param player: X or O
+        :return: result of is_end after the move
+        """
+        if player not in self.line_counts:
+            raise ValueError(f'player must be X or O, not {player!r}')
+        if not self.is_move_valid(x, y):
+            raise ValueError(f'({x}, {y}) is not an empty field of the board')
+        self._board[x][y] = player
+        self.moves += 1
+        counts = self.line_counts[player]
+        for line in self.layout.line_ids[x * self.size + y]:
+            counts[line] += 1
+            if counts[line] == self.k:
+                self.completed_lines[player] += 1
+        return self.is_end()
+
+    def unmake_move(self, x, y):
+        """
+        take back a sign and update counters of the lines through it
+        :param x: coordinate
+        :param y: coordinate
+        :return:
+        """
+        if not (0 <= x < self.size and 0 <= y < self.size) or self._board[x][y] not in self.line_counts:
+            raise ValueError(f'({x}, {y}) is not a taken field of the board')
+        player = self._board[x][y]
+        self._board[x][y] = '.'
+        self.moves -= 1
+        counts = self.line_counts[player]
+        for line in self.layout.line_ids[x * self.size + y]:
+            if counts[line] == self.k:
+                self.completed_lines[player] -= 1
+            counts[line] -= 1
 
     def is_move_valid(self, x, y):
         """
@@ -73,10 +203,10 @@ class Game:
         :return: true if move is valid
         """
         # out of board
-        if x < 0 or x > 2 or y < 0 or y > 2:
+        if x < 0 or x > self.size - 1 or y < 0 or y > self.size - 1:
             return False
         # full
-        elif self.board[x][y] != '.':
+        elif self._board[x][y] != '.':
             return False
         else:
             return True
@@ -84,38 +214,13 @@ class Game:
     def is_end(self):
         """
         check if game has ended and return winner or announce draw
+        counters are updated by make_move, so this doesn't scan the board
         :return: string sign to show condition
         """
-        # vertical win
-        for i in range(3):
-            if (
-                    self.board[0][i] != '.' and
-                    self.board[0][i] == self.board[1][i] and
-                    self.board[1][i] == self.board[2][i]
-            ):
-                return self.board[0][i]
-        # horizontal win
-        for i in range(3):
-            if (
-                    self.board[i][0] != '.' and
-                    self.board[i][0] == self.board[i][1] and
-                    self.board[i][0] == self.board[i][2]
-            ):
-                return self.board[i][0]
-        # main diagonal win
-        if (
-                self.board[0][0] != '.' and
-                self.board[0][0] == self.board[1][1] and
-                self.board[0][0] == self.board[2][2]
-        ):
-            return self.board[0][0]
-        # second diagonal win
-        if (
-                self.board[0][2] != '.' and
-                self.board[0][2] == self.board[1][1] and
-                self.board[0][2] == self.board[2][0]
-        ):
-            return self.board[0][2]
+        if self.completed_lines['X']:
+            return 'X'
+        if self.completed_lines['O']:
+            return 'O'
 
         if self._is_board_full():
             # It's a draw
@@ -129,377 +234,419 @@ class Game:
         used in is_end function
         :return: true if board is full
         """
-        for i in range(3):
-            for j in range(3):
-                # there's an empty field
-                if self.board[i][j] == '.':
-                    return False
-        return True
+        return self.moves == self.layout.cells
+
+    def _levels(self, levels):
+        """
+        max_depth of Hard and Easy levels for this board
+        :param levels: MINIMAX_LEVELS or ALPHA_BETA_LEVELS
+        :return: hard, easy
+        """
+        # smaller boards use 3x3 levels, larger ones the largest size in the table
+        return levels[min(max(self.size, 3), max(levels))]
 
-    def max_minimax(self, depth=0, max_depth=999, max_player='O', min_player='X'):
+    def max_minimax(self, depth=0, max_depth=None, max_player='O', min_player='X'):
         """
         maximizer
         :param max_player: could be X or O
         :param min_player: could be O or X
         :param depth: current depth
-        :param max_depth: maximum depth algorithm would traverse
+        :param max_depth: maximum depth algorithm would traverse(Hard level of this board if not given)
         :return:
         """
-        # first move is randomly chosen(not always (0, 0))
-        if self.is_board_empty():
-            return 0, randint(0, 2), randint(0, 2)
-
-        # control algorithm level
-        if depth > max_depth:
-            return 0, 0, 0
+        if max_depth is None:
+            max_depth = self._levels(MINIMAX_LEVELS)[0]
+        return self.search(max_player, max_depth - depth, prune=False)
 
-        # worse than the worst case
-        max_val = -2
-        # init x and y(coordinates)
-        x = None
-        y = None
-        # check if game is finished
-        result = self.is_end()
-        # first return is evaluation function value, second and third are move coordinates
-        if result == min_player:
-            return -1, 0, 0
-        elif result == max_player:
-            return 1, 0, 0
-        elif result == '.':
-            return 0, 0, 0
-        #  find best move recursively
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == '.':
-                    # on the empty field max player makes a move and calls min
-                    self.board[i][j] = max_player
-                    m, min_i, min_j = self.min_minimax(depth+1, max_depth, max_player, min_player)
-                    # change m value then set new x & y
-                    if m > max_val:
-                        max_val = m
-                        x = i
-                        y = j
-                    # set back the field to empty
-                    self.board[i][j] = '.'
-        return max_val, x, y
-
-    def min_minimax(self, depth=0, max_depth=999, max_player='O', min_player='X'):
+    def min_minimax(self, depth=0, max_depth=None, max_player='O', min_player='X'):
         """
         minimizer
         :param max_player: could be X or O
         :param min_player: could be O or X
         :param depth: current depth
-        :param max_depth: maximum depth algorithm would traverse
+        :param max_depth: maximum depth algorithm would traverse(Hard level of this board if not given)
         :return:
         """
-        # first move is randomly chosen(not always (0, 0))
-        if self.is_board_empty():
-            return 0, randint(0, 2), randint(0, 2)
-
-        # control algorithm level
-        if depth > max_depth:
-            return 0, 0, 0
+        if max_depth is None:
+            max_depth = self._levels(MINIMAX_LEVELS)[0]
+        m, x, y = self.search(min_player, max_depth - depth, prune=False)
+        # value of minimizer turned into maximizer value
+        return -m, x, y
 
-        # worse than the worst case
-        min_val = 2
-        # init x and y(coordinates)
-        x = None
-        y = None
-        # check if game is finished
-        result = self.is_end()
-        # first return is evaluation function value, second and third are move coordinates
-        if result == min_player:
-            return -1, 0, 0
-        elif result == max_player:
-            return 1, 0, 0
-        elif result == '.':
-            return 0, 0, 0
-        #  find best move recursively
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == '.':
-                    # on the empty field max player makes a move and calls min
-                    self.board[i][j] = min_player
-                    m, max_i, max_j = self.max_minimax(depth+1, max_depth, max_player, min_player)
-                    # change m value then set new x & y
-                    if m < min_val:
-                        min_val = m
-                        x = i
-                        y = j
-                    # set back the field to empty
-                    self.board[i][j] = '.'
-        return min_val, x, y
-
-    def max_alpha_beta(self, alpha, beta, depth=0, max_depth=999):
-        """
-        maximizer using alpha-beta pruning
+    def max_alpha_beta(self, alpha, beta, depth=0, max_depth=None):
+        """
+        maximizer(O) using alpha-beta pruning
         :param alpha:
         :param beta:
         :param depth: current depth
-        :param max_depth: maximum depth algorithm would traverse
+        :param max_depth: maximum depth algorithm would traverse(Hard level of this board if not given)
         :return:
         """
-        # alpha and beta value
-        # print(f'(alpha: {alpha}, beta: {beta})')
-
-        # first move is randomly chosen(not always (0, 0))
-        if self.is_board_empty():
-            return 0, randint(0, 2), randint(0, 2)
+        if max_depth is None:
+            max_depth = self._levels(ALPHA_BETA_LEVELS)[0]
+        return self.search('O', max_depth - depth, alpha=alpha, beta=beta)
 
-        # control algorithm level
-        if depth > max_depth:
-            return 0, 0, 0
-
-        # worse than the worst case
-        max_val = -2
-        # init x and y(coordinates)
-        x = None
-        y = None
-        # check if game is finished
-        result = self.is_end()
-        if result == 'X':
-            return -1, 0, 0
-        elif result == 'O':
-            return 1, 0, 0
-        elif result == '.':
-            return 0, 0, 0
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == '.':
-                    self.board[i][j] = 'O'
-                    (m, min_i, in_j) = self.min_alpha_beta(alpha, beta, depth+1, max_depth=max_depth)
-                    if m > max_val:
-                        max_val = m
-                        x = i
-                        y = j
-                    self.board[i][j] = '.'
-                    if max_val >= beta:
-                        # announce beta-cut
-                        # print("beta cut")
-                        return max_val, x, y
-                    if max_val > alpha:
-                        alpha = max_val
-
-        return max_val, x, y
-
-    def min_alpha_beta(self, alpha, beta, depth=0, max_depth=999):
-        """
-        minimizer using alpha-beta pruning
+    def min_alpha_beta(self, alpha, beta, depth=0, max_depth=None):
+        """
+        minimizer(X) using alpha-beta pruning
         :param alpha:
         :param beta:
         :param depth: current depth
-        :param max_depth: maximum depth algorithm would traverse
+        :param max_depth: maximum depth algorithm would traverse(Hard level of this board if not given)
+        :return:
+        """
+        if max_depth is None:
+            max_depth = self._levels(ALPHA_BETA_LEVELS)[0]
+        # window and value of minimizer are maximizer's negated
+        m, x, y = self.search('X', max_depth - depth, alpha=-beta, beta=-alpha)
+        return -m, x, y
+
+    def iterative_alpha_beta(self, player='O', time_budget=1.0, max_depth=None, cancel=None):
+        """
+        iterative deepening alpha-beta, searches 1, 2, 3... moves ahead until time budget is over
+        :param player: player to move, O is the maximizer and X is the minimizer
+        :param time_budget: seconds to search
+        :param max_depth: deepest max_depth to search(whole tree if not given)
+        :param cancel: threading.Event, search stops as soon as it's set
+        :return: evaluation value(for maximizer) and move of the last completed iteration
+        """
+        m, x, y = self.search(player, max_depth, budget=time_budget, cancel=cancel)
+        # value of minimizer turned into maximizer value
+        if player == 'X':
+            m = -m
+        return m, x, y
+
+    def search(self, player, max_depth=None, prune=True, alpha=-2, beta=2, budget=None, cancel=None):
+        """
+        search best move of player on current board with search.best_move(used by all algorithms)
+        :param player: player to move, could be X or O
+        :param max_depth: maximum depth algorithm would traverse(whole tree if not given)
+        :param prune: alpha-beta pruning, minimax searches every move if False
+        :param alpha: player's lower bound
+        :param beta: player's upper bound
+        :param budget: seconds to search with iterative deepening, or None for one search to max_depth
+        :param cancel: threading.Event, timed search stops as soon as it's set
+        :return: evaluation value for player, move coordinates
+        """
+        # pondering thread shares the transposition table, it must be stopped first
+        self.stop_pondering()
+        position = Position.from_board(self._board, self.k)
+        # reply was already searched while the human was thinking
+        result = None
+        if self.ponderer is not None and budget is None and alpha == -2 and beta == 2:
+            result = self.ponderer.result(position, player, max_depth, prune)
+        # only whole window alpha-beta searches to a fixed depth are split
+        parallel = self.splitter is not None and prune and budget is None and cancel is None
+        if result is None and parallel and alpha == -2 and beta == 2:
+            result = self.splitter.best_move(
+                position, player, max_depth, hashing='zobrist' if self.transposition_table is not None else None
+            )
+        # when the whole tree is searched every best move is scored exactly and one of them is chosen, so the first
+        # move isn't always the same either(searches to a horizon return the first best move, scoring ties costs
+        # them about twice the nodes)
+        empty = bin(position.layout.full ^ (position.x_bits | position.o_bits)).count('1')
+        whole_tree = max_depth is None or max_depth >= empty - 1
+        tie_break = self.tie_break is not None and whole_tree and budget is None and cancel is None
+        if result is None and tie_break and not self.instrument and alpha == -2 and beta == 2:
+            analysis = analyse(
+                position, player, max_depth=max_depth, top=1, prune=prune, table=self.transposition_table,
+                ordering=self.move_ordering
+            )
+            chosen = choose(analysis.moves, self.tie_break)
+            result = SearchResult(chosen.move if chosen is not None else None, analysis.score, analysis.stats)
+        if result is None:
+            result = best_move(
+                position, player, budget=budget, max_depth=max_depth, prune=prune, alpha=alpha, beta=beta,
+                table=self.transposition_table, ordering=self.move_ordering, cancel=cancel, instrument=self.instrument
+            )
+        self.stats = result.stats
+        if self.cache is not None and self.transposition_table is not None:
+            self.cache.save(self.transposition_table, force=False)
+        self.nodes = result.stats['nodes']
+        self.completed_depth = result.stats['completed_depth']
+        # game is finished
+        if result.move is None:
+            return result.score, 0, 0
+        return result.score, result.move[0], result.move[1]
+
+    def analyse(self, player, max_depth=None, top=None, prune=True):
+        """
+        exact scores and principal variations of moves of player on current board, e.g. for move hints
+        :param player: player to move, could be X or O
+        :param max_depth: maximum depth algorithm would traverse(whole tree if not given)
+        :param top: number of best moves(with moves tied with the last of them), all moves if not given
+        :param prune: alpha-beta pruning, minimax searches every move if False
+        :return: search.Analysis, scores are for player
+        """
+        self.stop_pondering()
+        analysis = analyse(
+            Position.from_board(self._board, self.k), player, max_depth=max_depth, top=top, prune=prune,
+            table=self.transposition_table, ordering=self.move_ordering
+        )
+        if self.cache is not None and self.transposition_table is not None:
+            self.cache.save(self.transposition_table, force=False)
+        return analysis
+
+    def use_cache(self, path=None):
+        """
+        fill transposition table from a persistent cache file, new entries are written back in batches
+        and when the program exits
+        :param path: cache file(cache.PATH if not given)
+        :return: number of loaded entries
+        """
+        self.cache = PositionCache() if path is None else PositionCache(path)
+        atexit.register(self.save_cache)
+        return self.cache.load(self.transposition_table)
+
+    def use_workers(self, workers=None, shared_table=True):
+        """
+        search root moves of alpha-beta in parallel from now on
+        :param workers: number of processes(cpu count if not given)
+        :param shared_table: replace transposition table with one in shared memory all workers use(and the
+                             persistent cache is filled from and written from), otherwise worker processes keep
+                             their own tables that aren't cached
         :return:
         """
-        # alpha and beta value
-        # print(f'(alpha: {alpha}, beta: {beta})')
+        table = None
+        if shared_table and self.transposition_table is not None:
+            self.stop_pondering()
+            table = SharedTranspositionTable(self.layout)
+            if self.cache is not None:
+                # entries of the old table are moved through the cache file
+                self.cache.save(self.transposition_table)
+                self.cache.load(table)
+            self.transposition_table = table
+        self.splitter = RootSplitter(workers, table=table)
+        atexit.register(self.close_workers)
+
+    def close_workers(self):
+        """
+        shut down worker processes, a shared table is written to the cache and freed(searches of this process
+        use a new table from now on)
+        :return:
+        """
+        if self.splitter is not None:
+            self.splitter.close()
+            self.splitter = None
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.save_cache()
+            self.transposition_table.close()
+            self.transposition_table = TranspositionTable(self.layout)
 
-        # first move is randomly chosen(not always (0, 0))
-        if self.is_board_empty():
-            return 0, randint(0, 2), randint(0, 2)
+    def save_cache(self):
+        """
+        write all new entries of transposition table to the cache file
+        :return:
+        """
+        if self.cache is not None and self.transposition_table is not None:
+            self.stop_pondering()
+            self.cache.save(self.transposition_table)
 
-        # control algorithm level
-        if depth > max_depth:
-            return 0, 0, 0
+    def start_pondering(self, player, max_depth=None, prune=True, predicted=None):
+        """
+        search AI replies to every human move on a background thread until stop_pondering
+        the thread reads a copy of current board, the board can be changed while it runs
+        :param player: player of the AI, it moves after the human
+        :param max_depth: max_depth the AI will search with
+        :param prune: alpha-beta pruning, minimax if False
+        :param predicted: (x, y) likely human move, searched first
+        :return:
+        """
+        if self.ponderer is None:
+            self.ponderer = Ponderer(self.layout, self.transposition_table)
+        # table may have been replaced or disabled since
+        self.ponderer.table = self.transposition_table
+        human = 'X' if player == 'O' else 'O'
+        self.ponderer.start(Position.from_board(self._board, self.k), human, player, max_depth, prune, predicted)
 
-        # worse than the worst case
-        min_val = 2
-        # init x and y(coordinates)
-        x = None
-        y = None
-        # check if game is finished
-        result = self.is_end()
-        if result == 'X':
-            return -1, 0, 0
-        elif result == 'O':
-            return 1, 0, 0
-        elif result == '.':
-            return 0, 0, 0
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == '.':
-                    self.board[i][j] = 'X'
-                    (m, max_i, max_j) = self.max_alpha_beta(alpha, beta, depth+1, max_depth=max_depth)
-                    if m < min_val:
-                        min_val = m
-                        x = i
-                        y = j
-                    self.board[i][j] = '.'
-                    if min_val <= alpha:
-                        # announce alpha-cut
-                        # print("alpha cut")
-                        return min_val, x, y
-                    if min_val < beta:
-                        beta = min_val
-        return min_val, x, y
+    def stop_pondering(self):
+        """
+        cancel pondering, finished searches are kept until pondering starts again
+        :return:
+        """
+        if self.ponderer is not None:
+            self.ponderer.stop()
+
+    def max_table(self):
+        """
+        maximizer(O) using perfect play table, falls back to alpha-beta if table is missing
+        :return:
+        """
+        return self._table_move('O')
+
+    def min_table(self):
+        """
+        minimizer(X) using perfect play table, falls back to alpha-beta if table is missing
+        :return:
+        """
+        return self._table_move('X')
+
+    def _table_move(self, player):
+        """
+        read value and a best move of current board from perfect play table(used in max_table and min_table)
+        :param player: player to move, X or O
+        :return:
+        """
+        # 3x3 has the perfect play table, other boards up to 4x4 a tablebase
+        if self.perfect_table is None:
+            self.perfect_table = load_table(self.layout)
+        if self.perfect_table is not None:
+            x_bits, o_bits = self.layout.from_board(self._board, 'X', 'O')
+            entry = self.perfect_table.lookup(x_bits, o_bits, player == 'X')
+            if entry is not None:
+                value, distance, moves = entry
+                # value of the player to move turned into maximizer(O) value
+                m = value - DRAW if player == 'O' else DRAW - value
+                if not moves:
+                    return m, 0, 0
+                # any best move is perfect, choose one randomly
+                move = choice(moves)
+                return m, move // self.size, move % self.size
+        # table not generated(or position not reachable), search instead
+        if player == 'O':
+            return self.max_alpha_beta(-2, 2)
+        return self.min_alpha_beta(-2, 2)
+
+    def max_mcts(self, budget=None):
+        """
+        maximizer(O) using Monte Carlo Tree Search
+        :param budget: seconds to search(Hard level of this board if not given)
+        :return:
+        """
+        return self._mcts_move('O', budget)
+
+    def min_mcts(self, budget=None):
+        """
+        minimizer(X) using Monte Carlo Tree Search
+        :param budget: seconds to search(Hard level of this board if not given)
+        :return:
+        """
+        m, x, y = self._mcts_move('X', budget)
+        # value of minimizer turned into maximizer value
+        return -m, x, y
+
+    def _mcts_move(self, player, budget):
+        """
+        search current board with MCTS, the tree of previous moves is reused(used in max_mcts and min_mcts)
+        :param player: player to move, X or O
+        :param budget: seconds to search
+        :return: average result of the move for player(-1 to 1), move coordinates
+        """
+        if budget is None:
+            budget = self._levels(MCTS_LEVELS)[0]
+        if self.mcts is None:
+            self.mcts = MCTS(self.layout)
+        result = self.mcts.search(Position.from_board(self._board, self.k), player, budget=budget)
+        self.stats = result.stats
+        # game is finished
+        if result.move is None:
+            return result.score, 0, 0
+        return result.score, result.move[0], result.move[1]
 
     def play_minimax(self):
         """
         playing the game(minimax)
         :return:
         """
+        self._play(
+            self.play_minimax, lambda level: self.max_minimax(max_depth=level),
+            lambda level: self.min_minimax(max_depth=level), self._set_level_minimax, ponder=False
+        )
+
+    def play_alpha_beta(self):
+        """
+        playing the game(alpha-beta)
+        :return:
+        """
+        self._play(
+            self.play_alpha_beta, lambda level: self.max_alpha_beta(-2, 2, max_depth=level),
+            lambda level: self.min_alpha_beta(-2, 2, max_depth=level), self._set_level_alpha_beta, ponder=True
+        )
+
+    def play_mcts(self):
+        """
+        playing the game(Monte Carlo Tree Search)
+        :return:
+        """
+        self._play(self.play_mcts, self.max_mcts, self.min_mcts, self._set_level_mcts)
+
+    def play_table(self):
+        """
+        playing the game(perfect play table)
+        :return:
+        """
+        self._play(self.play_table, lambda level: self.max_table(), lambda level: self.min_table())
+
+    def _play(self, restart, max_move, min_move, set_level=None, ponder=None):
+        """
+        play games of one algorithm until the user quits(used in play_minimax, play_alpha_beta, play_mcts and
+        play_table)
+        :param restart: play function of the algorithm, called to play again
+        :param max_move: maximizer(O) move of an AI level(None is Hard), returns value and move coordinates
+        :param min_move: minimizer(X) move of an AI level(None is Hard)
+        :param set_level: asks for the AI level, None if the algorithm has no levels
+        :param ponder: prune argument of pondering during human turns, None doesn't ponder
+        :return:
+        """
         print("Choose game mode:")
         game_mode = int(
             input("\t1: Human vs AI\n\t2: AI vs Human\n\t3: Human vs Human\n\t4: AI vs AI\nEnter your choice number: ")
         )
-        # Human vs AI(human is the game starter)
-        if game_mode == 1:
-            lvl = self._set_level_minimax()
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    while True:
-                        # calculate time of evaluating and its' value
-                        start = time.time()
-                        (m, ax, ay) = self.min_minimax(max_player='O', min_player='X')
-                        end = time.time()
-                        print(f'Evaluation time: {round(end-start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'X'
-                            self.turn = 'O'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-                # If it's AI's turn
-                else:
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.max_minimax(max_depth=lvl, max_player='O', min_player='X')
-                    end = time.time()
-                    print(f'Evaluation time: {round(end - start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'O'
-                    self.turn = 'X'
-
-        # AI vs Human(ai is the game starter)
-        if game_mode == 2:
-            lvl = self._set_level_minimax()
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.min_minimax(max_depth=lvl, max_player='O', min_player='X')
-                    end = time.time()
-                    print(f'Evaluation time: {round(end-start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'X'
-                    self.turn = 'O'
-                else:
-                    while True:
+        # human players of every mode(human is the game starter in Human vs AI)
+        humans = {1: ('X',), 2: ('O',), 3: ('X', 'O'), 4: ()}
+        # Invalid input for game mode
+        if game_mode not in humans:
+            print("Invalid input")
+            return restart()
+        humans = humans[game_mode]
+        # against a human AI plays the chosen level, AI vs AI plays Hard
+        against_ai = len(humans) == 1
+        lvl = set_level() if set_level is not None and against_ai else None
+        moves = {'O': max_move, 'X': min_move}
+        while True:
+            # check if game is finished and what to do next
+            self._end_play(restart)
+            player = self.turn
+            other = 'O' if player == 'X' else 'X'
+            if player in humans:
+                while True:
+                    if against_ai:
                         # calculate time of evaluating and its' value
                         start = time.time()
-                        (m, ax, ay) = self.max_minimax(max_player='O', min_player='X')
+                        (m, ax, ay) = moves[player](None)
                         end = time.time()
                         print(f'Evaluation time: {round(end - start, 2)}s')
-                        # print(f'Evaluation value: {m}')
                         print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'O'
-                            self.turn = 'X'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-
-        # Human vs Human
-        elif game_mode == 3:
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    while True:
-                        # calculate time of evaluating and its' value
-                        # start = time.time()
-                        # (m, ax, ay) = self.min_minimax(max_player='O', min_player='X')
-                        # end = time.time()
-                        # print(f'Evaluation time: {round(end-start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        # print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'X'
-                            self.turn = 'O'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-                else:
-                    while True:
-                        # calculate time of evaluating and its' value
-                        # start = time.time()
-                        # (m, ax, ay) = self.max_minimax(max_player='O', min_player='X')
-                        # end = time.time()
-                        # print(f'Evaluation time: {round(end-start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        # print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'O'
-                            self.turn = 'X'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-
-        # AI vs AI
-        elif game_mode == 4:
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.min_minimax(max_player='O', min_player='X')
-                    end = time.time()
-                    print(f'Evaluation time: {round(end - start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'X'
-                    self.turn = 'O'
-                else:
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.max_minimax(max_player='O', min_player='X')
-                    end = time.time()
-                    print(f'Evaluation time: {round(end - start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'O'
-                    self.turn = 'X'
-        # Invalid input for game mode
-        else:
-            print("Invalid input")
-            self.play_minimax()
-
-    def _end_play_minimax(self):
-        """
-        check if game is finished and what happen next(used in play_minimax)
+                        if ponder is not None:
+                            # search AI replies while human is thinking
+                            self.start_pondering(other, lvl, prune=ponder, predicted=(ax, ay))
+                    # choose move
+                    px = int(input('Insert the X coordinate: '))
+                    py = int(input('Insert the Y coordinate: '))
+                    self.stop_pondering()
+                    # make move
+                    if self.is_move_valid(px, py):
+                        self.make_move(px, py, player)
+                        self.turn = other
+                        break
+                    # invalid move
+                    else:
+                        print('The move is not valid! Try again.')
+            # If it's AI's turn
+            else:
+                # calculate time of evaluating and its' value
+                start = time.time()
+                (m, ax, ay) = moves[player](lvl)
+                end = time.time()
+                print(f'Evaluation time: {round(end - start, 2)}s')
+                print(f'Move: X = {ax}, Y = {ay}')
+                self.make_move(ax, ay, player)
+                self.turn = other
+
+    def _end_play(self, restart):
+        """
+        check if game is finished and what happen next(used in _play)
+        :param restart: play function of the algorithm, called to play again
         :return:
         """
         if self._playing_state():
@@ -510,7 +657,7 @@ class Game:
             # play again or quit
             user_input = input("If you want to play again enter <p> otherwise enter any key to quit: ")
             if user_input == 'p':
-                return self.play_minimax()
+                return restart()
             else:
                 sys.exit()
 
@@ -519,210 +666,48 @@ class Game:
         set AI level for minimax(used in play_minimax)
         :return: max_depth
         """
+        hard, easy = self._levels(MINIMAX_LEVELS)
         print("Choose AI level:")
         lvl = input("\t1: Hard\n\t2: Easy\nEnter your choice number: ")
         if lvl == '1':
-            return 999
+            return hard
         elif lvl == '2':
-            return 3
+            return easy
         else:
             print("Invalid input!")
             return self._set_level_minimax()
 
-    def play_alpha_beta(self):
+    def _set_level_alpha_beta(self):
         """
-        playing the game(alpha-beta)
-        :return:
+        set AI level for alpha-beta(used in play_alpha_beta)
+        :return: max_depth
         """
-        print("Choose game mode:")
-        game_mode = int(
-            input("\t1: Human vs AI\n\t2: AI vs Human\n\t3: Human vs Human\n\t4: AI vs AI\nEnter your choice number: ")
-        )
-        # Human vs AI(human is the game starter)
-        if game_mode == 1:
-            lvl = self._set_level_alpha_beta()
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    while True:
-                        # calculate time of evaluating and its' value
-                        start = time.time()
-                        (m, ax, ay) = self.min_alpha_beta(-2, 2)
-                        end = time.time()
-                        print(f'Evaluation time: {round(end-start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'X'
-                            self.turn = 'O'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-                # If it's AI's turn
-                else:
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.max_alpha_beta(-2, 2, max_depth=lvl)
-                    end = time.time()
-                    print(f'Evaluation time: {round(end - start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'O'
-                    self.turn = 'X'
-
-        # AI vs Human(ai is the game starter)
-        if game_mode == 2:
-            lvl = self._set_level_alpha_beta()
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.min_alpha_beta(-2, 2, max_depth=lvl)
-                    end = time.time()
-                    print(f'Evaluation time: {round(end-start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'X'
-                    self.turn = 'O'
-                else:
-                    while True:
-                        # calculate time of evaluating and its' value
-                        start = time.time()
-                        (m, ax, ay) = self.max_alpha_beta(-2, 2)
-                        end = time.time()
-                        print(f'Evaluation time: {round(end - start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'O'
-                            self.turn = 'X'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-
-        # Human vs Human
-        elif game_mode == 3:
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    while True:
-                        # calculate time of evaluating and its' value
-                        # start = time.time()
-                        # (m, ax, ay) = self.min_alpha_beta(-2, 2)
-                        # end = time.time()
-                        # print(f'Evaluation time: {round(end-start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        # print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'X'
-                            self.turn = 'O'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-                else:
-                    while True:
-                        # calculate time of evaluating and its' value
-                        # start = time.time()
-                        # (m, ax, ay) = self.max_alpha_beta(-2, 2)
-                        # end = time.time()
-                        # print(f'Evaluation time: {round(end-start, 2)}s')
-                        # print(f'Evaluation value: {m}')
-                        # print(f'Recommended move: X = {ax}, Y = {ay}')
-                        # choose move
-                        px = int(input('Insert the X coordinate: '))
-                        py = int(input('Insert the Y coordinate: '))
-                        # make move
-                        if self.is_move_valid(px, py):
-                            self.board[px][py] = 'O'
-                            self.turn = 'X'
-                            break
-                        # invalid move
-                        else:
-                            print('The move is not valid! Try again.')
-        # AI vs AI
-        elif game_mode == 4:
-            while True:
-                # check if game is finished and what to do next
-                self._end_play_minimax()
-
-                if self.turn == 'X':
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.min_alpha_beta(-2, 2)
-                    end = time.time()
-                    print(f'Evaluation time: {round(end - start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Recommended move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'X'
-                    self.turn = 'O'
-                else:
-                    # calculate time of evaluating and its' value
-                    start = time.time()
-                    (m, ax, ay) = self.max_alpha_beta(-2, 2)
-                    end = time.time()
-                    print(f'Evaluation time: {round(end - start, 2)}s')
-                    # print(f'Evaluation value: {m}')
-                    print(f'Recommended move: X = {ax}, Y = {ay}')
-                    self.board[ax][ay] = 'O'
-                    self.turn = 'X'
-        # Invalid input for game mode
+        hard, easy = self._levels(ALPHA_BETA_LEVELS)
+        print("Choose AI level:")
+        lvl = input("\t1: Hard\n\t2: Easy\nEnter your choice number: ")
+        if lvl == '1':
+            return hard
+        elif lvl == '2':
+            return easy
         else:
-            print("Invalid input")
-            self.play_alpha_beta()
-
-    def _end_play_alpha_beta(self):
-        """
-        check if game is finished and what happen next(used in play_alpha_beta)
-        :return:
-        """
-        if self._playing_state():
-            # reset board to the initial state
-            self.reset_board()
-            # reset turn to initial one
-            self.turn = self.game_starter
-            # play again or quit
-            user_input = input("If you want to play again enter <p> otherwise enter any key to quit: ")
-            if user_input == 'p':
-                return self.play_alpha_beta()
-            else:
-                sys.exit()
+            print("Invalid input!")
+            return self._set_level_alpha_beta()
 
-    def _set_level_alpha_beta(self):
+    def _set_level_mcts(self):
         """
-        set AI level for alpha-beta(used in play_alpha_beta)
-        :return: max_depth
+        set AI level for MCTS(used in play_mcts)
+        :return: seconds to search
         """
+        hard, easy = self._levels(MCTS_LEVELS)
         print("Choose AI level:")
         lvl = input("\t1: Hard\n\t2: Easy\nEnter your choice number: ")
         if lvl == '1':
-            return 999
+            return hard
         elif lvl == '2':
-            return 3
+            return easy
         else:
             print("Invalid input!")
-            return self._set_level_minimax()
+            return self._set_level_mcts()
 
     def _playing_state(self):
         """
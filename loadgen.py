@@ -0,0 +1,166 @@
+"""
+Load generator of the game server: many clients play random moves at once and move latency is measured
+run: python loadgen.py [--connections 100] [--games 10] [--size 3] [--engine alpha-beta] [--json]
+start the server first: python server.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+async def request(reader, writer, message):
+    """
+    send a request and wait for its reply
+    :param reader: asyncio.StreamReader
+    :param writer: asyncio.StreamWriter
+    :param message: request dict
+    :return: reply dict
+    """
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('server closed the connection')
+    return json.loads(line)
+
+
+async def client(host, port, games, size, k, engine, rng, latencies, counters):
+    """
+    one connection playing games one after another, human moves are random
+    :param host: server address
+    :param port: server port
+    :param games: games to play
+    :param size: board size
+    :param k: win length
+    :param engine: engine of the server
+    :param rng: random.Random of the client
+    :param latencies: list every request time(seconds) is added to
+    :param counters: dict of games, busy, timeouts and errors
+    :return:
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for index in range(games):
+            human = 'X' if index % 2 == 0 else 'O'
+            while True:
+                start = time.perf_counter()
+                reply = await request(
+                    reader, writer, {'op': 'new', 'size': size, 'k': k, 'human': human, 'engine': engine}
+                )
+                latencies.append(time.perf_counter() - start)
+                if reply['ok'] or reply['error'] != 'busy':
+                    break
+                counters['busy'] += 1
+                await asyncio.sleep(0.01)
+            if not reply['ok']:
+                counters['errors'] += 1
+                continue
+            session = reply['session']
+            while reply['result'] is None:
+                empty = [(i, j) for i, row in enumerate(reply['board']) for j, field in enumerate(row) if field == '.']
+                x, y = rng.choice(empty)
+                start = time.perf_counter()
+                answer = await request(reader, writer, {'op': 'move', 'session': session, 'x': x, 'y': y})
+                latencies.append(time.perf_counter() - start)
+                if answer['ok']:
+                    reply = answer
+                    counters['timeouts'] += bool(reply.get('timeout'))
+                elif answer['error'] == 'busy':
+                    # server is overloaded, wait a bit and send the move again
+                    counters['busy'] += 1
+                    await asyncio.sleep(0.01)
+                else:
+                    counters['errors'] += 1
+                    break
+            await request(reader, writer, {'op': 'close', 'session': session})
+            counters['games'] += 1
+    finally:
+        writer.close()
+
+
+def _percentile(ordered, p):
+    """
+    percentile of sorted values
+    :param ordered: sorted list
+    :param p: percentile between 0 and 100
+    :return: value
+    """
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run_load(host='127.0.0.1', port=8765, connections=100, games=10, size=3, k=None, engine='alpha-beta', seed=0):
+    """
+    run clients at once and summarize
+    :param host: server address
+    :param port: server port
+    :param connections: clients at once
+    :param games: games of every client
+    :param size: board size
+    :param k: win length(size if not given)
+    :param engine: engine of the server
+    :param seed: seed of random moves
+    :return: dict of results
+    """
+    latencies = []
+    counters = {'games': 0, 'busy': 0, 'timeouts': 0, 'errors': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, games, size, k, engine, random.Random(seed * 1000003 + i), latencies, counters)
+        for i in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies) or [0.0]
+    report = {
+        'connections': connections,
+        'requests': len(latencies),
+        'elapsed': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'games_per_second': counters['games'] / elapsed if elapsed else 0.0,
+        'p50_ms': _percentile(ordered, 50) * 1000,
+        'p95_ms': _percentile(ordered, 95) * 1000,
+        'p99_ms': _percentile(ordered, 99) * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+    report.update(counters)
+    return report
+
+
+def print_report(report):
+    """
+    print load test results
+    :param report: dict returned by run_load
+    :return:
+    """
+    print(
+        f"{report['games']} games, {report['requests']} requests on {report['connections']} connections "
+        f"in {report['elapsed']:.2f}s ({report['requests_per_second']:.1f} requests/s, "
+        f"{report['games_per_second']:.1f} games/s)"
+    )
+    print(
+        f"latency p50 {report['p50_ms']:.2f}ms, p95 {report['p95_ms']:.2f}ms, p99 {report['p99_ms']:.2f}ms, "
+        f"max {report['max_ms']:.2f}ms"
+    )
+    print(f"busy replies {report['busy']}, timed out moves {report['timeouts']}, errors {report['errors']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="game server load generator")
+    parser.add_argument('--host', default='127.0.0.1', help="server address")
+    parser.add_argument('--port', type=int, default=8765, help="server port")
+    parser.add_argument('--connections', type=int, default=100, help="clients at once")
+    parser.add_argument('--games', type=int, default=10, help="games of every client")
+    parser.add_argument('--size', type=int, default=3, help="board size")
+    parser.add_argument('--k', type=int, default=None, help="signs in a row to win(board size if not given)")
+    parser.add_argument('--engine', default='alpha-beta', help="engine of the server, see tournament.py")
+    parser.add_argument('--seed', type=int, default=0, help="seed of random moves")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+    load = asyncio.run(run_load(
+        args.host, args.port, args.connections, args.games, args.size, args.k, args.engine, args.seed
+    ))
+    if args.json:
+        print(json.dumps(load, indent=2))
+    else:
+        print_report(load)
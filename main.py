@@ -3,12 +3,43 @@ AI Final Project: Tic Tac Toe
 Author: sAm Mofidian
 Last Update: 1/22/2023
 """
+import argparse
+import json
+
+from cache import PATH
 from game import Game
+from tournament import parse_engine, print_report, run_tournament
+
 
+# board size and number of signs in a row to win
+BOARDS = {
+    '1': (3, 3),
+    '2': (4, 4),
+    '3': (5, 4),
+    '4': (7, 5),
+}
 
-def run():
+
+def choose_board():
+    """
+    select board size and win length
+    :return: size, k
+    """
+    board = input(
+        "Choose the board\n\t1: 3x3\n\t2: 4x4(4 in a row)\n\t3: 5x5(4 in a row)\n\t4: 7x7(5 in a row)\n"
+        "Enter the board number: "
+    )
+    if board not in BOARDS:
+        print("Invalid input!")
+        return choose_board()
+    return BOARDS[board]
+
+
+def run(cache=None, workers=None):
     """
     select playing algorithm
+    :param cache: persistent cache file of searched positions(None disables it)
+    :param workers: number of processes alpha-beta splits root moves between(None searches in this process)
     :return:
     """
     # initial message
@@ -16,18 +47,69 @@ def run():
     print(" "*20 + "Tic-Tac-Toe" + " "*20)
     print("*"*51)
     # init game
-    game = Game()
-    # choose algorithm(minimax vs alpha-beta)
-    alg = input("Choose the algorithm\n\t1: Alpha-Beta\n\t2: minimax\nEnter the algorithm number: ")
+    size, k = choose_board()
+    game = Game(size=size, k=k)
+    if cache is not None:
+        game.use_cache(cache)
+    if workers is not None:
+        game.use_workers(workers)
+    # choose algorithm(minimax vs alpha-beta vs perfect play table vs MCTS)
+    alg = input(
+        "Choose the algorithm\n\t1: Alpha-Beta\n\t2: minimax\n\t3: Perfect play table\n\t4: Monte Carlo Tree Search\n"
+        "Enter the algorithm number: "
+    )
     if alg == '1':
         game.play_alpha_beta()
     elif alg == '2':
         game.play_minimax()
+    elif alg == '3':
+        game.play_table()
+    elif alg == '4':
+        game.play_mcts()
     # invalid input
     else:
         print("Invalid input!")
-        return run()
+        return run(cache, workers)
+
+
+def parse_args():
+    """
+    command-line flags, without them the game is interactive
+    :return: argparse namespace
+    """
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe")
+    parser.add_argument('--tournament', nargs=2, metavar=('ENGINE_A', 'ENGINE_B'),
+                        help="play engines against each other without any input, e.g. alpha-beta random")
+    parser.add_argument('--games', type=int, default=100, help="number of games")
+    parser.add_argument('--size', type=int, default=3, help="board size")
+    parser.add_argument('--k', type=int, default=None, help="signs in a row to win(board size if not given)")
+    parser.add_argument('--openings', type=int, default=1, help="random moves at the start of every game")
+    parser.add_argument('--seed', type=int, default=0, help="seed of random moves")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of processes(cpu count if not given), a game splits alpha-beta between them")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    parser.add_argument('--cache', nargs='?', const=PATH, default=None, metavar='PATH',
+                        help="keep searched positions in a cache file across runs(positions.sqlite if not given)")
+    args = parser.parse_args()
+    # a typo in an engine name is a usage error, not a traceback
+    for engine in args.tournament or ():
+        try:
+            parse_engine(engine)
+        except ValueError as error:
+            parser.error(str(error))
+    return args
 
 
 if __name__ == '__main__':
-    run()
+    args = parse_args()
+    if args.tournament:
+        report = run_tournament(
+            *args.tournament, games=args.games, size=args.size, k=args.k, openings=args.openings,
+            seed=args.seed, workers=args.workers
+        )
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+    else:
+        run(args.cache, args.workers)
@@ -0,0 +1,322 @@
+"""
+Monte Carlo Tree Search(UCT) for boards too large to search exhaustively
+random games(rollouts) are played from the leaves of a growing tree, the most visited move is played
+"""
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from search import SearchResult
+
+# UCT exploration constant, sqrt(2) is the textbook value for results in [0, 1]
+EXPLORATION = 1.4
+
+
+class Node:
+    __slots__ = ('cell', 'parent', 'children', 'untried', 'visits', 'value', 'result')
+
+    def __init__(self, cell, parent, untried, result=None):
+        """
+        tree node, a position reached by a move
+        :param cell: move cell index(None at root)
+        :param parent: parent Node(None at root)
+        :param untried: empty fields not expanded yet, popped from the end
+        :param result: 1 if the move won the game, 0 if it filled the board, None otherwise
+        """
+        self.cell = cell
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        # sum of results for the player who made the move
+        self.value = 0.0
+        self.result = result
+
+
+class MCTS:
+    def __init__(self, layout, exploration=EXPLORATION, rollout='random', workers=1, seed=None):
+        """
+        initialize search of a board, the tree is kept between searches and reused
+        :param layout: board layout
+        :param exploration: UCT exploration constant, larger tries more moves
+        :param rollout: random(random moves) or greedy(win if possible, then block opponent's win, else random)
+        :param workers: processes searching at once, every other process searches its own tree and visit counts
+                        of root moves are added up(1 searches in this process only)
+        :param seed: random seed(None for a random one)
+        """
+        if rollout not in ('random', 'greedy'):
+            raise ValueError(f'unknown rollout {rollout}, choose random or greedy')
+        self.layout = layout
+        self.exploration = exploration
+        self.rollout = rollout
+        self.workers = workers
+        self.rng = random.Random(seed)
+        # reused tree and its position(x_bits, o_bits, x_to_move)
+        self.root = None
+        self.root_position = None
+        self.executor = None
+
+    def close(self):
+        """
+        stop worker processes
+        :return:
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def search(self, position, side_to_move, budget=None, playouts=None):
+        """
+        search best move of a position(same interface as search.best_move)
+        :param position: Position
+        :param side_to_move: X or O
+        :param budget: seconds to search(1 second if neither budget nor playouts is given)
+        :param playouts: number of rollouts(shared by all workers)
+        :return: SearchResult, score is the average result of the chosen move for side_to_move(-1 to 1)
+        """
+        start = time.perf_counter()
+        if budget is None and playouts is None:
+            budget = 1.0
+        deadline = start + budget if budget is not None else None
+        layout = self.layout
+        me, opp = position.bits(side_to_move)
+        result = layout.result(me, opp)
+        if result is not None:
+            return SearchResult(None, result, {'playouts': 0, 'nodes': 0, 'reused': 0, 'elapsed': 0.0})
+
+        root = self._reuse(position.x_bits, position.o_bits, side_to_move == 'X')
+        reused = root.visits
+        futures = []
+        if self.workers > 1:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers - 1)
+            share = None if playouts is None else playouts // self.workers
+            futures = [
+                self.executor.submit(
+                    _worker_search, position, side_to_move, budget, share, self.exploration, self.rollout,
+                    self.rng.getrandbits(32)
+                )
+                for _ in range(self.workers - 1)
+            ]
+            if playouts is not None:
+                playouts -= share * (self.workers - 1)
+        if playouts is not None:
+            playouts = max(playouts, 1)
+        count, nodes = self._run(root, me, opp, deadline, playouts)
+
+        # visits and results of root moves of every tree
+        totals = {child.cell: [child.visits, child.value] for child in root.children}
+        for future in futures:
+            worker_count, worker_nodes, moves = future.result()
+            count += worker_count
+            nodes += worker_nodes
+            for cell, visits, value in moves:
+                total = totals.setdefault(cell, [0, 0.0])
+                total[0] += visits
+                total[1] += value
+        cell, (visits, value) = max(totals.items(), key=lambda item: item[1][0])
+        stats = {
+            'playouts': count,
+            'nodes': nodes,
+            'reused': reused,
+            'elapsed': time.perf_counter() - start,
+        }
+        return SearchResult((cell // layout.size, cell % layout.size), value / visits if visits else 0.0, stats)
+
+    def _reuse(self, x_bits, o_bits, x_to_move):
+        """
+        find the subtree of a position in the kept tree(it's usually 1 or 2 moves deeper), or start a new tree
+        :param x_bits: X mask
+        :param o_bits: O mask
+        :param x_to_move: True if X moves next
+        :return: root Node
+        """
+        root = None
+        if self.root is not None:
+            old_x, old_o, old_x_to_move = self.root_position
+            # only positions reached by adding signs can be in the tree
+            if old_x & ~x_bits == 0 and old_o & ~o_bits == 0:
+                root = _descend(self.root, x_bits & ~old_x, o_bits & ~old_o, old_x_to_move)
+        if root is None:
+            root = self._new_node(None, None, x_bits | o_bits)
+        # older part of the tree can be freed
+        root.parent = None
+        self.root = root
+        self.root_position = (x_bits, o_bits, x_to_move)
+        return root
+
+    def _new_node(self, cell, parent, occupied, result=None):
+        """
+        create a node with its empty fields in random order
+        :param cell: move cell index
+        :param parent: parent Node
+        :param occupied: occupied fields mask after the move
+        :param result: result of the move
+        :return: Node
+        """
+        if result is not None:
+            return Node(cell, parent, [], result)
+        untried = [c for c in range(self.layout.cells) if not occupied >> c & 1]
+        self.rng.shuffle(untried)
+        return Node(cell, parent, untried)
+
+    def _run(self, root, me, opp, deadline, playouts):
+        """
+        grow the tree until time or playouts are over
+        :param root: root Node
+        :param me: mask of player to move at root
+        :param opp: mask of the other player
+        :param deadline: time.perf_counter() value to stop at, or None
+        :param playouts: number of rollouts, or None
+        :return: rollouts played, nodes created
+        """
+        layout = self.layout
+        full = layout.full
+        exploration = self.exploration
+        log = math.log
+        sqrt = math.sqrt
+        count = 0
+        nodes = 0
+        while True:
+            if playouts is not None and count >= playouts:
+                break
+            # clock is checked every 16 rollouts, at least one is played so there's a move to return
+            if deadline is not None and count and not count & 15 and time.perf_counter() >= deadline:
+                break
+            node = root
+            a, b = me, opp
+            # selection: follow the best UCT child while every move of a node is expanded
+            while node.result is None and not node.untried:
+                scale = exploration * sqrt(log(node.visits))
+                best = None
+                best_score = -math.inf
+                for child in node.children:
+                    score = child.value / child.visits + scale / sqrt(child.visits)
+                    if score > best_score:
+                        best_score = score
+                        best = child
+                node = best
+                a, b = b, a | 1 << node.cell
+            # expansion: add one untried move
+            if node.result is None:
+                cell = node.untried.pop()
+                a |= 1 << cell
+                if layout.wins(a, cell):
+                    result = 1
+                elif a | b == full:
+                    result = 0
+                else:
+                    result = None
+                child = self._new_node(cell, node, a | b, result)
+                node.children.append(child)
+                node = child
+                nodes += 1
+                a, b = b, a
+            # simulation: value for the player who made the move into node
+            if node.result is not None:
+                value = node.result
+            else:
+                value = -self._rollout(a, b)
+            # backpropagation: every level is the other player's result
+            while node is not None:
+                node.visits += 1
+                node.value += value
+                value = -value
+                node = node.parent
+            count += 1
+        return count, nodes
+
+    def _rollout(self, me, opp):
+        """
+        play a random game to the end
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :return: 1 if player to move wins, -1 if it loses, 0 for a draw
+        """
+        layout = self.layout
+        occupied = me | opp
+        empty = [cell for cell in range(layout.cells) if not occupied >> cell & 1]
+        self.rng.shuffle(empty)
+        greedy = self.rollout == 'greedy'
+        sign = 1
+        while empty:
+            cell = empty[-1]
+            if greedy:
+                # take a winning field, otherwise block the opponent's one
+                for candidate in empty:
+                    if layout.wins(me | 1 << candidate, candidate):
+                        cell = candidate
+                        break
+                else:
+                    for candidate in empty:
+                        if layout.wins(opp | 1 << candidate, candidate):
+                            cell = candidate
+                            break
+            empty.remove(cell)
+            me |= 1 << cell
+            if layout.wins(me, cell):
+                return sign
+            me, opp = opp, me
+            sign = -sign
+        return 0
+
+
+def _descend(node, new_x, new_o, x_to_move):
+    """
+    find the node reached by playing new signs from a node, in any order that alternates players
+    :param node: Node
+    :param new_x: X signs to add
+    :param new_o: O signs to add
+    :param x_to_move: True if X moves at node
+    :return: Node or None if it's not in the tree
+    """
+    if not new_x and not new_o:
+        return node
+    wanted = new_x if x_to_move else new_o
+    for child in node.children:
+        bit = 1 << child.cell
+        if wanted & bit:
+            if x_to_move:
+                found = _descend(child, new_x ^ bit, new_o, False)
+            else:
+                found = _descend(child, new_x, new_o ^ bit, True)
+            if found is not None:
+                return found
+    return None
+
+
+def _worker_search(position, side_to_move, budget, playouts, exploration, rollout, seed):
+    """
+    search a new tree in a worker process(used by MCTS.search)
+    :param position: Position
+    :param side_to_move: X or O
+    :param budget: seconds to search or None
+    :param playouts: number of rollouts or None
+    :param exploration: UCT exploration constant
+    :param rollout: random or greedy
+    :param seed: random seed
+    :return: rollouts played, nodes created, (cell, visits, value) of every root move
+    """
+    mcts = MCTS(position.layout, exploration, rollout, seed=seed)
+    deadline = time.perf_counter() + budget if budget is not None else None
+    root = mcts._reuse(position.x_bits, position.o_bits, side_to_move == 'X')
+    me, opp = position.bits(side_to_move)
+    count, nodes = mcts._run(root, me, opp, deadline, playouts)
+    return count, nodes, [(child.cell, child.visits, child.value) for child in root.children]
+
+
+def best_move(position, side_to_move, budget=None, playouts=None, exploration=EXPLORATION, rollout='random',
+              seed=None):
+    """
+    one MCTS search without tree reuse
+    :param position: Position
+    :param side_to_move: X or O
+    :param budget: seconds to search
+    :param playouts: number of rollouts
+    :param exploration: UCT exploration constant
+    :param rollout: random or greedy
+    :param seed: random seed
+    :return: SearchResult
+    """
+    return MCTS(position.layout, exploration, rollout, seed=seed).search(position, side_to_move, budget, playouts)
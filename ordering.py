@@ -0,0 +1,80 @@
+"""
+Move ordering heuristics for alpha-beta, good moves first means earlier cutoffs
+"""
+
+
+class MoveOrdering:
+    def __init__(self, layout, priors=True, hash_move=True, killers=True, history=False):
+        """
+        initialize heuristics of a board, each of them can be turned off
+        :param layout: board layout
+        :param priors: static order, fields on more win lines first(center, corners, then edges on 3x3)
+        :param hash_move: best move saved in transposition table(or previous iteration) first
+        :param killers: moves that caused a cutoff at the same depth first
+        :param history: moves that caused more(and deeper) cutoffs anywhere first(off by default, it searched more
+                        nodes than killers alone at Hard depths)
+        """
+        self.layout = layout
+        self.priors = priors
+        self.hash_move = hash_move
+        self.killers = killers
+        self.history = history
+        if priors:
+            self.static_order = sorted(range(layout.cells), key=lambda cell: -len(layout.lines_through[cell]))
+        else:
+            self.static_order = list(range(layout.cells))
+        # two killer moves for every depth
+        self.killer_moves = [[None, None] for _ in range(layout.cells + 1)]
+        # history score of every field(shared by both players, a good field for one is worth blocking for the other)
+        self.history_scores = [0] * layout.cells
+
+    def clear(self):
+        """
+        forget killer moves and history scores(before searching a new position)
+        :return:
+        """
+        for killer in self.killer_moves:
+            killer[0] = killer[1] = None
+        for cell in range(self.layout.cells):
+            self.history_scores[cell] = 0
+
+    def order(self, empty, depth, hash_move=None):
+        """
+        order empty fields of a position
+        :param empty: empty fields mask
+        :param depth: current depth
+        :param hash_move: best move saved in transposition table
+        :return: list of cell indexes
+        """
+        moves = [cell for cell in self.static_order if empty >> cell & 1]
+        if self.history:
+            # sort is stable, equal scores keep static order
+            moves.sort(key=self.history_scores.__getitem__, reverse=True)
+        first = []
+        # a move of a colliding table entry can point at a taken cell
+        if self.hash_move and hash_move is not None and empty >> hash_move & 1:
+            first.append(hash_move)
+        if self.killers:
+            for killer in self.killer_moves[depth]:
+                if killer is not None and empty >> killer & 1 and killer not in first:
+                    first.append(killer)
+        if first:
+            moves = first + [cell for cell in moves if cell not in first]
+        return moves
+
+    def cutoff(self, cell, depth, remaining):
+        """
+        save a move that caused a cutoff
+        :param cell: move cell index
+        :param depth: current depth
+        :param remaining: depth left to search below the position
+        :return:
+        """
+        if self.killers:
+            killer = self.killer_moves[depth]
+            if killer[0] != cell:
+                killer[1] = killer[0]
+                killer[0] = cell
+        if self.history:
+            # deeper cutoffs save more nodes
+            self.history_scores[cell] += remaining * remaining
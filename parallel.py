@@ -0,0 +1,358 @@
+"""
+Parallel alpha-beta: root moves are split between worker processes
+every root move is a task searched with its own window, tasks share the values of finished moves in shared memory,
+a task rereads the best of them before every move of its own root and every 256 nodes, so it still prunes
+the first root move is searched before the others(young brothers wait), so there's an alpha from the start
+"""
+import math
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from operator import xor
+
+import evaluation
+from ordering import MoveOrdering
+from search import Search, SearchAborted, SearchResult, search_stats
+from shared_table import SharedTranspositionTable
+from transposition import EXACT, LOWER, TranspositionTable
+
+# value slot of a root move that isn't searched yet
+UNFINISHED = math.nan
+SLOT = struct.Struct('<d')
+
+# transposition tables of a worker process by board, kept between tasks like Game keeps its table:
+# (size, k, hashing) -> (search id, table)
+_tables = {}
+# shared table a worker process is attached to: block name -> SharedTranspositionTable
+_shared_tables = {}
+
+
+def _alpha(buffer, count):
+    """
+    best value of finished root moves
+    :param buffer: value slots
+    :param count: number of root moves
+    :return: value, -2 if no move is finished
+    """
+    values = [SLOT.unpack_from(buffer, i * SLOT.size)[0] for i in range(count)]
+    return max((value for value in values if not math.isnan(value)), default=-2)
+
+
+class _TaskSearch(Search):
+    def __init__(self, layout, buffer, count, table=None, ordering=None, evaluator=None):
+        """
+        search of a root move task, values of finished root moves are reread every 256 nodes
+        :param layout: board layout
+        :param buffer: value slots of root moves
+        :param count: number of root moves
+        :param table: transposition table or None
+        :param ordering: MoveOrdering or None for row-major order
+        :param evaluator: Evaluator of positions at the horizon, or None to score them as draws
+        """
+        # no deadline, but _check_stop is called every 256 nodes
+        super().__init__(layout, table, ordering, deadline=math.inf, evaluator=evaluator)
+        self.buffer = buffer
+        self.count = count
+        # best value of the task root found so far, for its player to move
+        self.best = -2
+
+    def beta(self):
+        """
+        beta of the task root: a move as good as the best finished one is still searched exactly
+        :return: upper bound for player to move at task root
+        """
+        return -math.nextafter(_alpha(self.buffer, self.count), -math.inf)
+
+    def _check_stop(self):
+        """
+        stop searching the task root move if it's already refuted by a root move that finished meanwhile
+        :return:
+        """
+        if self.best >= self.beta():
+            raise SearchAborted()
+
+    def search_root(self, me, opp, x_to_move, max_depth):
+        """
+        negamax of the task root(position after a root move), beta is narrowed before every move
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :param x_to_move: True if X moves at task root
+        :param max_depth: maximum depth algorithm would traverse
+        :return: value for player to move(exact if it's below beta, else a lower bound)
+        """
+        self.nodes += 1
+        self.set_root(me, opp, x_to_move)
+        layout = self.layout
+        table = self.table
+        hashes = self.hashes
+        if table is not None:
+            if hashes is None:
+                key, symmetry = table.key(me, opp)
+            else:
+                key = min(hashes)
+                symmetry = hashes.index(key)
+            # no move is needed here, an entry of another task(or worker) decides it
+            m = table.probe(key, max_depth, -2, self.beta())
+            if m is not None:
+                return m
+        occupied = me | opp
+        empty = layout.full ^ occupied
+        ordering = self.ordering
+        if ordering is None:
+            moves = [cell for cell in range(layout.cells) if empty >> cell & 1]
+        else:
+            moves = ordering.order(empty, 0, table.move(key, symmetry) if table is not None else None)
+        move = None
+        beta = 2
+        move_keys = self.move_keys[0] if hashes is not None else None
+        evaluator = self.evaluator
+        features = self.features
+        for cell in moves:
+            beta = min(beta, self.beta())
+            if self.best >= beta:
+                self.cutoffs += 1
+                break
+            bit = 1 << cell
+            if layout.wins(me | bit, cell):
+                m = 1
+                self.terminals += 1
+            elif occupied | bit == layout.full:
+                m = 0
+                self.terminals += 1
+            else:
+                if hashes is not None:
+                    self.hashes = tuple(map(xor, hashes, move_keys[cell]))
+                if evaluator is not None:
+                    self.features = evaluator.play(features, me, opp, cell)
+                try:
+                    m, _ = self.negamax(opp, me | bit, -beta, -max(self.best, -2), 1, max_depth, True)
+                except SearchAborted:
+                    # the task is refuted, the unfinished move is dropped
+                    beta = self.beta()
+                    break
+                m = -m
+                self.hashes = hashes
+                self.features = features
+            if m > self.best:
+                self.best = m
+                move = cell
+        else:
+            beta = min(beta, self.beta())
+        best = self.best
+        if table is not None:
+            table.store(key, max_depth, best, LOWER if best >= beta else EXACT, move, symmetry)
+        return best
+
+
+def _shared_table(name, layout):
+    """
+    shared table of a worker process, attached on first use(tables of earlier splitters are detached)
+    :param name: block of the table
+    :param layout: board layout
+    :return: SharedTranspositionTable
+    """
+    if name not in _shared_tables:
+        for table in _shared_tables.values():
+            table.close()
+        _shared_tables.clear()
+        _shared_tables[name] = SharedTranspositionTable(layout, name=name)
+    return _shared_tables[name]
+
+
+def _search_move(name, count, index, position, player, max_depth, ordering, evaluator, hashing, keep_tables,
+                 shared):
+    """
+    search a root move with the best value of finished moves as alpha, reread while it's searched(runs in a worker
+    process)
+    :param name: shared memory block of value slots
+    :param count: number of root moves
+    :param index: slot of this move
+    :param position: Position after the move
+    :param player: player to move after the move
+    :param max_depth: maximum depth below the move
+    :param ordering: use move ordering
+    :param evaluator: use evaluator at the horizon
+    :param hashing: transposition table hashing or None without a table
+    :param keep_tables: keep entries of earlier searches in the table of this worker
+    :param shared: block of a shared table all workers use instead of their own tables(the table itself when
+                   searched in the process that created it), or None
+    :return: value of the move for the player at root(exact if it's better than alpha, else an upper bound),
+             stats of the search(with hits on entries of other processes)
+    """
+    start = time.perf_counter()
+    # workers share the resource tracker of the process that created the block, it's unlinked there
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        table = None
+        if isinstance(shared, SharedTranspositionTable):
+            table = shared
+        elif shared is not None:
+            table = _shared_table(shared, position.layout)
+        elif hashing is not None:
+            key = (position.size, position.k, hashing)
+            if key not in _tables:
+                _tables[key] = (name, TranspositionTable(position.layout, hashing=hashing))
+            search_id, table = _tables[key]
+            # block name is different for every search
+            if search_id != name:
+                if not keep_tables:
+                    table.clear()
+                _tables[key] = (name, table)
+        cross_hits = table.cross_hits if shared is not None else 0
+        hits = table.hits if table is not None else 0
+        misses = table.misses if table is not None else 0
+        layout = position.layout
+        me, opp = position.bits(player)
+        # horizon isn't reached when the whole tree is searched
+        last_depth = bin(layout.full ^ (me | opp)).count('1') - 1
+        if evaluator and max_depth < last_depth:
+            evaluator = evaluation.evaluator(layout) if evaluator is True else evaluator
+        else:
+            evaluator = None
+        search = _TaskSearch(
+            layout, block.buf, count, table, MoveOrdering(layout) if ordering else None, evaluator
+        )
+        # the task root is one move below root
+        value = -search.search_root(me, opp, player == 'X', max_depth)
+        stats = search_stats(search, max_depth, start, hits, misses)
+        stats['table_cross_hits'] = table.cross_hits - cross_hits if shared is not None else 0
+        SLOT.pack_into(block.buf, index * SLOT.size, value)
+        # the search holds views of the block
+        search.buffer = None
+    finally:
+        block.close()
+    return value, stats
+
+
+class RootSplitter:
+    def __init__(self, workers=None, table=None):
+        """
+        process pool of parallel searches, created on first search and kept between them
+        :param workers: number of processes(cpu count if not given, 1 searches in this process)
+        :param table: SharedTranspositionTable all workers read and write, or None for a table of every worker
+        """
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.table = table
+        self.executor = None
+
+    def best_move(self, position, side_to_move, max_depth=None, ordering=True, evaluator=True, hashing='zobrist',
+                  young_brothers_wait=True, keep_tables=True):
+        """
+        search best move of a position, root moves are searched in parallel
+        move and score are the same as search.best_move, except that depth limited searches with tables can score
+        a little differently: deeper entries of worker tables aren't the ones a single table would have
+        :param position: Position
+        :param side_to_move: X or O
+        :param max_depth: maximum depth algorithm would traverse(whole tree if not given)
+        :param ordering: move ordering in every worker
+        :param evaluator: evaluator of positions at the horizon(not used when the whole tree is searched)
+        :param hashing: hashing of transposition table of every worker, None searches without a table
+                        (not used with a shared table)
+        :param young_brothers_wait: search the first root move before the others
+        :param keep_tables: keep entries of earlier searches in worker tables(False searches with empty tables)
+        :return: SearchResult, stats are summed over workers, table_cross_hits are hits on entries another
+                 process stored in the shared table
+        """
+        start = time.perf_counter()
+        layout = position.layout
+        me, opp = position.bits(side_to_move)
+        stats = {
+            'nodes': 1, 'terminals': 0, 'cutoffs': 0, 'table_hits': 0, 'table_misses': 0, 'table_cross_hits': 0,
+            'completed_depth': None, 'elapsed': 0.0, 'workers': self.workers,
+        }
+        result = layout.result(me, opp)
+        if result is not None:
+            stats['nodes'] = 0
+            stats['elapsed'] = time.perf_counter() - start
+            return SearchResult(None, result, stats)
+        empty = layout.full ^ (me | opp)
+        last_depth = bin(empty).count('1') - 1
+        if max_depth is None or max_depth > last_depth:
+            max_depth = last_depth
+        # the same root order as a search with a new move ordering
+        moves = MoveOrdering(layout).order(empty, 0) if ordering else [
+            cell for cell in range(layout.cells) if empty >> cell & 1
+        ]
+        other = 'O' if side_to_move == 'X' else 'X'
+        shared = None
+        if self.table is not None:
+            shared = self.table if self.workers == 1 else self.table.name
+            if not keep_tables:
+                self.table.clear()
+        values = [None] * len(moves)
+        tasks = []
+        block = shared_memory.SharedMemory(create=True, size=SLOT.size * len(moves))
+        try:
+            for index, cell in enumerate(moves):
+                SLOT.pack_into(block.buf, index * SLOT.size, UNFINISHED)
+            for index, cell in enumerate(moves):
+                bit = 1 << cell
+                # finished games are scored here, like in negamax
+                if layout.wins(me | bit, cell):
+                    values[index] = 1
+                elif me | opp | bit == layout.full:
+                    values[index] = 0
+                else:
+                    child = position.play(cell // position.size, cell % position.size, side_to_move)
+                    tasks.append((
+                        block.name, len(moves), index, child, other, max_depth - 1, ordering, evaluator, hashing,
+                        keep_tables, shared
+                    ))
+                    continue
+                stats['terminals'] += 1
+                SLOT.pack_into(block.buf, index * SLOT.size, values[index])
+
+            if self.workers == 1:
+                finished = [(task[2], _search_move(*task)) for task in tasks]
+            else:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                finished = []
+                if young_brothers_wait and tasks:
+                    finished.append((tasks[0][2], self.executor.submit(_search_move, *tasks[0]).result()))
+                    tasks = tasks[1:]
+                futures = [(task[2], self.executor.submit(_search_move, *task)) for task in tasks]
+                finished += [(index, future.result()) for index, future in futures]
+        finally:
+            block.close()
+            block.unlink()
+
+        for index, (value, child_stats) in finished:
+            values[index] = value
+            for name in ('nodes', 'terminals', 'cutoffs', 'table_hits', 'table_misses', 'table_cross_hits'):
+                stats[name] += child_stats[name]
+        # values equal to the best one are exact, the first of them in root order is the move of a serial search
+        score = max(values)
+        move = moves[values.index(score)]
+        stats['completed_depth'] = max_depth
+        stats['elapsed'] = time.perf_counter() - start
+        return SearchResult((move // position.size, move % position.size), score, stats)
+
+    def close(self):
+        """
+        shut down the process pool
+        :return:
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def best_move(position, side_to_move, max_depth=None, workers=None, **options):
+    """
+    parallel search with a new process pool(use RootSplitter to keep the pool between searches)
+    :param position: Position
+    :param side_to_move: X or O
+    :param max_depth: maximum depth algorithm would traverse(whole tree if not given)
+    :param workers: number of processes(cpu count if not given)
+    :param options: RootSplitter.best_move options
+    :return: SearchResult
+    """
+    splitter = RootSplitter(workers)
+    try:
+        return splitter.best_move(position, side_to_move, max_depth, **options)
+    finally:
+        splitter.close()
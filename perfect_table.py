@@ -0,0 +1,167 @@
+"""
+Perfect-play table of every reachable 3x3 position
+generate it once with: python perfect_table.py
+every record is 16 bits:
+    bits 0-1: value for the player to move(0 = not reachable, 1 = loss, 2 = draw, 3 = win)
+    bits 2-5: distance to result(plies)
+    bits 6-14: best moves mask(bit i is cell i)
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import bitboard
+
+MAGIC = b'TTT1'
+# default table file, next to this module
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perfect_play.bin')
+
+LOSS = 1
+DRAW = 2
+WIN = 3
+
+# table is built for the classic board only
+LAYOUT = bitboard.layout(3, 3)
+
+# every cell is a base 3 digit(0 empty, 1 X, 2 O), two records per board(X or O to move)
+RECORDS = 2 * 3 ** LAYOUT.cells
+_POW3 = [3 ** i for i in range(LAYOUT.cells)]
+
+
+def index(x_bits, o_bits, x_to_move):
+    """
+    record index of a position
+    :param x_bits: X mask
+    :param o_bits: O mask
+    :param x_to_move: True if X moves next
+    :return: int
+    """
+    i = 0
+    while x_bits:
+        bit = x_bits & -x_bits
+        x_bits ^= bit
+        i += _POW3[bit.bit_length() - 1]
+    while o_bits:
+        bit = o_bits & -o_bits
+        o_bits ^= bit
+        i += 2 * _POW3[bit.bit_length() - 1]
+    return 2 * i + (0 if x_to_move else 1)
+
+
+def _solve(x_bits, o_bits, x_to_move, records):
+    """
+    solve a position and all positions reachable from it
+    :param x_bits: X mask
+    :param o_bits: O mask
+    :param x_to_move: True if X moves next
+    :param records: output array, also used as memo
+    :return: value for the player to move, distance to result
+    """
+    i = index(x_bits, o_bits, x_to_move)
+    record = records[i]
+    if record:
+        return record & 3, record >> 2 & 15
+
+    result = LAYOUT.result(x_bits, o_bits)
+    if result is not None:
+        # previous player has won, or it's a draw
+        value = DRAW if result == 0 else LOSS
+        records[i] = value
+        return value, 0
+
+    # (value, -distance) for wins so faster is better, (value, distance) otherwise
+    best = None
+    best_moves = 0
+    empty = LAYOUT.full ^ (x_bits | o_bits)
+    while empty:
+        bit = empty & -empty
+        empty ^= bit
+        if x_to_move:
+            child, distance = _solve(x_bits | bit, o_bits, False, records)
+        else:
+            child, distance = _solve(x_bits, o_bits | bit, True, records)
+        # opponent's value turned into ours
+        value = WIN + LOSS - child if child != DRAW else DRAW
+        distance += 1
+        score = (value, -distance if value == WIN else distance)
+        if best is None or score > best:
+            best = score
+            best_moves = bit
+        elif score == best:
+            best_moves |= bit
+    value = best[0]
+    distance = -best[1] if value == WIN else best[1]
+    records[i] = value | distance << 2 | best_moves << 6
+    return value, distance
+
+
+def generate(path=PATH):
+    """
+    solve every reachable position(X or O as starter) and write the table file
+    :param path: table file
+    :return: number of solved positions
+    """
+    records = array('H', [0]) * RECORDS
+    _solve(0, 0, True, records)
+    _solve(0, 0, False, records)
+    if sys.byteorder != 'little':
+        records.byteswap()
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(records.tobytes())
+    return sum(1 for record in records if record)
+
+
+class PerfectPlayTable:
+    def __init__(self, path=PATH):
+        """
+        memory-map a generated table file
+        :param path: table file
+        """
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC or len(self.data) != len(MAGIC) + 2 * RECORDS:
+            self.data.close()
+            raise ValueError(f'{path} is not a perfect play table')
+
+    @classmethod
+    def load(cls, path=PATH):
+        """
+        load table if it's generated
+        :param path: table file
+        :return: table or None if file is missing or invalid
+        """
+        try:
+            return cls(path)
+        except (OSError, ValueError):
+            return None
+
+    def lookup(self, x_bits, o_bits, x_to_move):
+        """
+        read a position
+        :param x_bits: X mask
+        :param o_bits: O mask
+        :param x_to_move: True if X moves next
+        :return: value for the player to move(LOSS, DRAW or WIN), distance to result, best moves cell indexes
+                 or None if position is not reachable
+        """
+        record, = struct.unpack_from('<H', self.data, len(MAGIC) + 2 * index(x_bits, o_bits, x_to_move))
+        if not record:
+            return None
+        best_moves = record >> 6
+        moves = [cell for cell in range(LAYOUT.cells) if best_moves >> cell & 1]
+        return record & 3, record >> 2 & 15, moves
+
+    def close(self):
+        """
+        unmap table file
+        :return:
+        """
+        self.data.close()
+
+
+if __name__ == '__main__':
+    count = generate()
+    print(f'{count} positions written to {PATH}')
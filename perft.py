@@ -0,0 +1,192 @@
+"""
+Perft: count the game tree breadth first, one ply at a time, with the whole frontier in NumPy arrays(pip install numpy)
+positions of a ply are deduplicated(optionally up to rotations and reflections) and every unique position carries
+the number of move sequences reaching it, so node counts stay exact while every position is expanded only once
+run: python perft.py --size 3 [--k 3] [--depth 9] [--symmetry]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import bitboard
+
+ONE = np.uint64(1)
+
+
+def _dedup(x_bits, o_bits, counts):
+    """
+    merge equal positions, their counts are added
+    :param x_bits: uint64 array of X masks
+    :param o_bits: uint64 array of O masks
+    :param counts: int64 array of move sequences reaching every position
+    :return: unique x_bits, o_bits and counts, index of every unique position in the given arrays
+    """
+    order = np.lexsort((o_bits, x_bits))
+    x_bits = x_bits[order]
+    o_bits = o_bits[order]
+    starts = np.flatnonzero(np.r_[True, (x_bits[1:] != x_bits[:-1]) | (o_bits[1:] != o_bits[:-1])])
+    return x_bits[starts], o_bits[starts], np.add.reduceat(counts[order], starts), order[starts]
+
+
+def _canonical(x_bits, o_bits, layout):
+    """
+    canonical form of every position, the smallest (X mask, O mask) of its rotations and reflections
+    like Layout.canonical
+    :param x_bits: uint64 array of X masks
+    :param o_bits: uint64 array of O masks
+    :param layout: board layout
+    :return: canonical x_bits, o_bits
+    """
+    best_x = x_bits
+    best_o = o_bits
+    for target in layout.targets[1:]:
+        x = np.zeros_like(x_bits)
+        o = np.zeros_like(o_bits)
+        for cell in range(layout.cells):
+            source = np.uint64(cell)
+            destination = np.uint64(target[cell])
+            x |= (x_bits >> source & ONE) << destination
+            o |= (o_bits >> source & ONE) << destination
+        smaller = (x < best_x) | ((x == best_x) & (o < best_o))
+        best_x = np.where(smaller, x, best_x)
+        best_o = np.where(smaller, o, best_o)
+    return best_x, best_o
+
+
+def expand(x_bits, o_bits, counts, layout, x_to_move):
+    """
+    children of every position of a frontier
+    :param x_bits: uint64 array of X masks
+    :param o_bits: uint64 array of O masks
+    :param counts: int64 array of move sequences reaching every position
+    :param layout: board layout
+    :param x_to_move: True if X moves in every position
+    :return: x_bits, o_bits and counts of children, bool array of finished children(won or full board),
+             bool array of won children
+    """
+    full = np.uint64(layout.full)
+    mover = x_bits if x_to_move else o_bits
+    other = o_bits if x_to_move else x_bits
+    occupied = x_bits | o_bits
+    movers = []
+    others = []
+    child_counts = []
+    wins = []
+    for cell in range(layout.cells):
+        bit = np.uint64(1 << cell)
+        free = occupied & bit == 0
+        if not free.any():
+            continue
+        moved = mover[free] | bit
+        # only lines through the new sign can be completed
+        lines = np.array(layout.lines_through[cell], dtype=np.uint64)
+        movers.append(moved)
+        others.append(other[free])
+        child_counts.append(counts[free])
+        wins.append(np.any(moved[:, None] & lines == lines, axis=1))
+    if not movers:
+        empty = np.zeros(0, dtype=np.uint64)
+        return empty, empty, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+    moved = np.concatenate(movers)
+    other = np.concatenate(others)
+    won = np.concatenate(wins)
+    x_bits, o_bits = (moved, other) if x_to_move else (other, moved)
+    finished = won | ((x_bits | o_bits) == full)
+    return x_bits, o_bits, np.concatenate(child_counts), finished, won
+
+
+def frontiers(layout, depth=None, symmetry=False, x_bits=0, o_bits=0, x_to_move=True):
+    """
+    expand a position breadth first
+    :param layout: board layout
+    :param depth: plies to expand(until every game is finished if not given)
+    :param symmetry: merge rotations and reflections of positions too
+    :param x_bits: X mask of root position
+    :param o_bits: O mask of root position
+    :param x_to_move: True if X moves at root
+    :return: generator of (ply, x_bits, o_bits, counts, finished, won) of every ply, arrays of unique positions,
+             unfinished ones are the frontier of the next ply
+    """
+    x = np.array([x_bits], dtype=np.uint64)
+    o = np.array([o_bits], dtype=np.uint64)
+    counts = np.ones(1, dtype=np.int64)
+    depth = layout.cells if depth is None else depth
+    for ply in range(1, depth + 1):
+        if not len(x):
+            return
+        x, o, counts, finished, won = expand(x, o, counts, layout, x_to_move)
+        if not len(x):
+            return
+        if symmetry:
+            # rotations and reflections of a position are finished alike
+            x, o = _canonical(x, o, layout)
+        x, o, counts, first = _dedup(x, o, counts)
+        finished = finished[first]
+        won = won[first]
+        yield ply, x, o, counts, finished, won
+        keep = ~finished
+        x = x[keep]
+        o = o[keep]
+        counts = counts[keep]
+        x_to_move = not x_to_move
+
+
+def perft(size=3, k=None, depth=None, symmetry=False, x_bits=0, o_bits=0, x_to_move=True):
+    """
+    count nodes and unique positions of every ply of the game tree
+    :param size: board size
+    :param k: number of signs in a row to win(board size if not given)
+    :param depth: plies to count(until every game is finished if not given)
+    :param symmetry: count positions that are rotations or reflections of each other once
+    :param x_bits: X mask of root position
+    :param o_bits: O mask of root position
+    :param x_to_move: True if X moves at root
+    :return: list of dicts, one per ply: nodes(move sequences of that length), unique positions,
+             x_wins, o_wins and draws(move sequences finishing a game at that ply), elapsed seconds
+    """
+    layout = bitboard.layout(size, size if k is None else k)
+    rows = []
+    start = time.perf_counter()
+    mover_is_x = x_to_move
+    for ply, x, o, counts, finished, won in frontiers(layout, depth, symmetry, x_bits, o_bits, x_to_move):
+        wins = int(counts[won].sum())
+        rows.append({
+            'ply': ply,
+            'nodes': int(counts.sum()),
+            'unique': len(x),
+            'x_wins': wins if mover_is_x else 0,
+            'o_wins': 0 if mover_is_x else wins,
+            'draws': int(counts[finished & ~won].sum()),
+            'elapsed': time.perf_counter() - start,
+        })
+        mover_is_x = not mover_is_x
+    return rows
+
+
+def print_table(rows):
+    """
+    print perft counts
+    :param rows: list returned by perft
+    :return:
+    """
+    print(f"{'Ply':>4}{'Nodes':>16}{'Unique':>12}{'X wins':>14}{'O wins':>14}{'Draws':>14}{'Elapsed':>10}")
+    for r in rows:
+        print(
+            f"{r['ply']:>4}{r['nodes']:>16}{r['unique']:>12}{r['x_wins']:>14}{r['o_wins']:>14}{r['draws']:>14}"
+            f"{r['elapsed']:>9.2f}s"
+        )
+    print(
+        f"{'all':>4}{sum(r['nodes'] for r in rows):>16}{sum(r['unique'] for r in rows):>12}"
+        f"{sum(r['x_wins'] for r in rows):>14}{sum(r['o_wins'] for r in rows):>14}{sum(r['draws'] for r in rows):>14}"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="breadth first perft")
+    parser.add_argument('--size', type=int, default=3, help="board size")
+    parser.add_argument('--k', type=int, default=None, help="signs in a row to win(board size if not given)")
+    parser.add_argument('--depth', type=int, default=None, help="plies to count(whole game if not given)")
+    parser.add_argument('--symmetry', action='store_true', help="count rotations and reflections once")
+    args = parser.parse_args()
+    print_table(perft(args.size, args.k, args.depth, args.symmetry))
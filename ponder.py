@@ -0,0 +1,101 @@
+"""
+Pondering: search AI replies to likely human moves on a background thread while the human is thinking
+the thread only reads an immutable Position, the board the human plays on is never touched
+"""
+import threading
+
+from ordering import MoveOrdering
+from search import SearchAborted, best_move
+
+
+class Ponderer:
+    def __init__(self, layout, table=None):
+        """
+        initialize pondering of a board
+        :param layout: board layout
+        :param table: transposition table filled while pondering, results of unfinished searches are reused
+                      through it(it must not be used by another search until stop returns)
+        """
+        self.layout = layout
+        self.table = table
+        # the thread has its own move ordering, it's not thread-safe either
+        self.ordering = MoveOrdering(layout)
+        # results of finished searches: (position, player, max_depth, prune) -> SearchResult
+        self.results = {}
+        self.cancel = threading.Event()
+        self.thread = None
+
+    def start(self, position, human, player, max_depth=None, prune=True, predicted=None):
+        """
+        start searching AI replies to every human move, predicted move first
+        :param position: Position before the human move
+        :param human: player of the human, X or O
+        :param player: player of the AI, O or X
+        :param max_depth: maximum depth of AI searches(whole tree if not given)
+        :param prune: alpha-beta pruning, minimax if False
+        :param predicted: (x, y) human move that is searched first
+        :return:
+        """
+        self.stop()
+        self.results = {}
+        self.cancel = threading.Event()
+        empty = self.layout.full ^ (position.x_bits | position.o_bits)
+        replies = [cell for cell in self.ordering.static_order if empty >> cell & 1]
+        if predicted is not None:
+            cell = predicted[0] * position.size + predicted[1]
+            if cell in replies:
+                replies.remove(cell)
+                replies.insert(0, cell)
+        self.thread = threading.Thread(
+            target=self._run, args=(position, human, player, max_depth, prune, replies, self.cancel), daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """
+        cancel pondering and wait for the thread, search it was running is dropped
+        :return:
+        """
+        if self.thread is not None:
+            self.cancel.set()
+            self.thread.join()
+            self.thread = None
+
+    def result(self, position, player, max_depth=None, prune=True):
+        """
+        result of a pondered search
+        :param position: Position after the human move
+        :param player: player of the AI
+        :param max_depth: maximum depth of the search
+        :param prune: alpha-beta pruning
+        :return: SearchResult or None if it wasn't searched(or not finished)
+        """
+        return self.results.get((position, player, max_depth, prune))
+
+    def _run(self, position, human, player, max_depth, prune, replies, cancel):
+        """
+        search replies until all are searched or pondering is cancelled(runs on the thread)
+        :param position: Position before the human move
+        :param human: player of the human
+        :param player: player of the AI
+        :param max_depth: maximum depth of AI searches
+        :param prune: alpha-beta pruning
+        :param replies: human moves in search order
+        :param cancel: threading.Event of this run
+        :return:
+        """
+        for cell in replies:
+            if cancel.is_set():
+                return
+            child = position.play(cell // position.size, cell % position.size, human)
+            # human's move finishes the game, nothing to reply
+            if self.layout.result(child.x_bits, child.o_bits) is not None:
+                continue
+            try:
+                result = best_move(
+                    child, player, max_depth=max_depth, prune=prune, table=self.table, ordering=self.ordering,
+                    cancel=cancel
+                )
+            except SearchAborted:
+                return
+            self.results[(child, player, max_depth, prune)] = result
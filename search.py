@@ -0,0 +1,836 @@
+"""
+Stateless best move search, safe to run from many threads or processes at once
+a position is an immutable value and every search keeps its own state
+"""
+import cProfile
+import io
+import math
+import pstats
+import random
+import time
+from collections import namedtuple
+from operator import xor
+
+import bitboard
+import evaluation
+from ordering import MoveOrdering
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+# result of a search: move is (x, y) or None if game is finished, score is for the player to move
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'stats'])
+# exact score of a root move for the player to move and its principal variation(list of (x, y), move first)
+RootMove = namedtuple('RootMove', ['move', 'score', 'pv'])
+# result of a root analysis: RootMoves best first(empty if game is finished), stats like SearchResult
+Analysis = namedtuple('Analysis', ['moves', 'score', 'stats'])
+# policies of choose
+TIE_BREAKS = ('first', 'random')
+
+
+class SearchAborted(Exception):
+    """
+    raised inside a timed search when its time is over or it's cancelled
+    """
+
+
+class Position(namedtuple('Position', ['x_bits', 'o_bits', 'size', 'k'])):
+    """
+    immutable board: X and O masks of a size x size board with k in a row to win
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_board(cls, board, k=None):
+        """
+        build position of a list of lists board
+        :param board: list of lists board
+        :param k: win length(board size if not given)
+        :return: Position
+        """
+        size = len(board)
+        k = size if k is None else k
+        x_bits, o_bits = bitboard.layout(size, k).from_board(board, 'X', 'O')
+        return cls(x_bits, o_bits, size, k)
+
+    @property
+    def layout(self):
+        """
+        shared layout of this board
+        :return: Layout
+        """
+        return bitboard.layout(self.size, self.k)
+
+    def bits(self, player):
+        """
+        masks of a player and the other one
+        :param player: X or O
+        :return: player mask, opponent mask
+        """
+        if player == 'X':
+            return self.x_bits, self.o_bits
+        return self.o_bits, self.x_bits
+
+    def play(self, x, y, player):
+        """
+        position after a move
+        :param x: coordinate
+        :param y: coordinate
+        :param player: X or O
+        :return: new Position
+        """
+        bit = 1 << (x * self.size + y)
+        if player == 'X':
+            return self._replace(x_bits=self.x_bits | bit)
+        return self._replace(o_bits=self.o_bits | bit)
+
+
+class Search:
+    def __init__(self, layout, table=None, ordering=None, deadline=None, cancel=None, evaluator=None):
+        """
+        state of one search
+        :param layout: board layout
+        :param table: transposition table or None
+        :param ordering: MoveOrdering or None for row-major order
+        :param deadline: time.perf_counter() value search stops at, or None
+        :param cancel: threading.Event, search stops as soon as it's set
+        :param evaluator: Evaluator of positions at the horizon, or None to score them as draws
+        """
+        self.layout = layout
+        self.table = table
+        self.ordering = ordering
+        self.deadline = deadline
+        self.cancel = cancel
+        self.evaluator = evaluator
+        # evaluator features of current position, see set_root
+        self.features = None
+        # zobrist hashes of current position and keys of moves of both players(by depth parity),
+        # only with a zobrist table, see set_root
+        self.hashes = None
+        self.move_keys = None
+        # counters every search keeps, cheap enough to never turn off
+        self.nodes = 0
+        self.terminals = 0
+        self.cutoffs = 0
+
+    def negamax(self, me, opp, alpha, beta, depth, max_depth, prune):
+        """
+        negamax on bitboards of a position that is not finished
+        a position is worth the negated value of the opponent's best reply
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param depth: current depth
+        :param max_depth: maximum depth algorithm would traverse
+        :param prune: alpha-beta pruning, minimax searches every move if False
+        :return: evaluation function value for player to move, move cell index
+        """
+        self.nodes += 1
+        # timed search checks its clock every 256 nodes
+        if self.deadline is not None and not self.nodes & 255:
+            self._check_stop()
+        # control algorithm level
+        if depth > max_depth:
+            if self.evaluator is None:
+                return 0, 0
+            return self.evaluator.value(self.features), 0
+
+        # reuse value of an already searched position(never at root, a move is needed there)
+        table = self.table
+        hashes = self.hashes
+        if table is not None:
+            if hashes is None:
+                key, symmetry = table.key(me, opp)
+            else:
+                # smallest hash is the same for all rotations and reflections
+                key = min(hashes)
+                symmetry = hashes.index(key)
+            if depth > 0:
+                m = table.probe(key, max_depth - depth, alpha, beta)
+                if m is not None:
+                    return m, 0
+        # window bound before searching, used to flag the stored value
+        alpha_orig = alpha
+
+        layout = self.layout
+        occupied = me | opp
+        empty = layout.full ^ occupied
+        # try the most promising moves first(order doesn't matter without pruning)
+        ordering = self.ordering if prune else None
+        if ordering is None:
+            moves = [cell for cell in range(layout.cells) if empty >> cell & 1]
+        else:
+            moves = ordering.order(empty, depth, table.move(key, symmetry) if table is not None else None)
+        # worse than the worst case
+        best = -2
+        move = None
+        move_keys = self.move_keys[depth & 1] if hashes is not None else None
+        evaluator = self.evaluator
+        features = self.features
+        for cell in moves:
+            bit = 1 << cell
+            # only lines through the new sign can be completed
+            if layout.wins(me | bit, cell):
+                m = 1
+                self.terminals += 1
+            elif occupied | bit == layout.full:
+                m = 0
+                self.terminals += 1
+            else:
+                if hashes is not None:
+                    self.hashes = tuple(map(xor, hashes, move_keys[cell]))
+                if evaluator is not None:
+                    self.features = evaluator.play(features, me, opp, cell)
+                m, _ = self.negamax(opp, me | bit, -beta, -alpha, depth + 1, max_depth, prune)
+                m = -m
+                self.hashes = hashes
+                self.features = features
+            if m > best:
+                best = m
+                move = cell
+            if prune:
+                if best >= beta:
+                    self.cutoffs += 1
+                    if ordering is not None:
+                        ordering.cutoff(cell, depth, max_depth - depth)
+                    break
+                if best > alpha:
+                    alpha = best
+
+        if table is not None:
+            if best <= alpha_orig:
+                flag = UPPER
+            elif best >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table.store(key, max_depth - depth, best, flag, move, symmetry)
+        return best, move
+
+    def root_values(self, me, opp, max_depth, prune, top=None):
+        """
+        search every root move with its own window(call set_root first), children share table and ordering
+        a move is searched exactly unless top moves with a better score are already known
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :param max_depth: maximum depth algorithm would traverse
+        :param prune: alpha-beta pruning below root moves
+        :param top: number of best moves to score exactly, all of them if not given
+        :return: list of (cell, value, exact) in search order, values that aren't exact are upper bounds
+        """
+        self.nodes += 1
+        layout = self.layout
+        table = self.table
+        hashes = self.hashes
+        key = None
+        symmetry = 0
+        if table is not None:
+            if hashes is None:
+                key, symmetry = table.key(me, opp)
+            else:
+                key = min(hashes)
+                symmetry = hashes.index(key)
+        occupied = me | opp
+        empty = layout.full ^ occupied
+        if self.ordering is None or not prune:
+            moves = [cell for cell in range(layout.cells) if empty >> cell & 1]
+        else:
+            moves = self.ordering.order(empty, 0, table.move(key, symmetry) if table is not None else None)
+        move_keys = self.move_keys[0] if hashes is not None else None
+        evaluator = self.evaluator
+        features = self.features
+        values = []
+        exact = []
+        for cell in moves:
+            # a move as good as the top-th best one is still searched exactly, so all tied moves are known
+            if top is not None and len(exact) >= top:
+                alpha = math.nextafter(sorted(exact, reverse=True)[top - 1], -math.inf)
+            else:
+                alpha = -2
+            bit = 1 << cell
+            if layout.wins(me | bit, cell):
+                m = 1
+                self.terminals += 1
+            elif occupied | bit == layout.full:
+                m = 0
+                self.terminals += 1
+            else:
+                if hashes is not None:
+                    self.hashes = tuple(map(xor, hashes, move_keys[cell]))
+                if evaluator is not None:
+                    self.features = evaluator.play(features, me, opp, cell)
+                m, _ = self.negamax(opp, me | bit, -2, -alpha, 1, max_depth, prune)
+                m = -m
+                self.hashes = hashes
+                self.features = features
+            # minimax values are always exact
+            values.append((cell, m, not prune or m > alpha))
+            if not prune or m > alpha:
+                exact.append(m)
+
+        if table is not None:
+            best, move = max(((m, cell) for cell, m, _ in values), key=lambda value: value[0])
+            table.store(key, max_depth, best, EXACT, move, symmetry)
+        return values
+
+    def set_root(self, me, opp, x_to_move):
+        """
+        compute zobrist hashes(only with a zobrist table) and evaluator features of root position
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :param x_to_move: True if X moves at root
+        :return:
+        """
+        if self.evaluator is not None:
+            self.features = self.evaluator.features(me, opp)
+        zobrist = self.table.zobrist if self.table is not None else None
+        if zobrist is None:
+            self.hashes = None
+            return
+        x_bits, o_bits = (me, opp) if x_to_move else (opp, me)
+        self.hashes = zobrist.hashes(x_bits, o_bits, x_to_move)
+        # root player moves at even depths
+        player = 0 if x_to_move else 1
+        self.move_keys = (zobrist.move_keys[player], zobrist.move_keys[1 - player])
+
+    def _check_stop(self):
+        """
+        stop timed search if time is over or it's cancelled(used in negamax)
+        :return:
+        """
+        if time.perf_counter() >= self.deadline or (self.cancel is not None and self.cancel.is_set()):
+            raise SearchAborted()
+
+
+class IterativeSearch(Search):
+    def __init__(self, layout, table=None, ordering=None, deadline=None, cancel=None, evaluator=None):
+        """
+        search that walks the tree with an explicit stack instead of recursion, same results and counters as Search
+        :param layout: board layout
+        :param table: transposition table or None
+        :param ordering: MoveOrdering or None for row-major order
+        :param deadline: time.perf_counter() value search stops at, or None
+        :param cancel: threading.Event, search stops as soon as it's set
+        :param evaluator: Evaluator of positions at the horizon, or None to score them as draws
+        """
+        super().__init__(layout, table, ordering, deadline, cancel, evaluator)
+        # one frame of every depth, allocated once: a search is never deeper than the number of fields
+        frames = layout.cells + 2
+        self.me_stack = [0] * frames
+        self.opp_stack = [0] * frames
+        self.alpha_stack = [0] * frames
+        self.beta_stack = [0] * frames
+        self.alpha_orig_stack = [0] * frames
+        self.best_stack = [0] * frames
+        self.move_stack = [None] * frames
+        # moves of a frame: list of ordered moves and index of the next one, or a mask of the moves left without
+        # ordering(taken lowest field first, so no list is built), and the field searched last
+        self.moves_stack = [None] * frames
+        self.index_stack = [0] * frames
+        self.cell_stack = [0] * frames
+        self.key_stack = [None] * frames
+        self.symmetry_stack = [0] * frames
+        self.hashes_stack = [None] * frames
+        self.features_stack = [None] * frames
+
+    def negamax(self, me, opp, alpha, beta, depth, max_depth, prune):
+        """
+        negamax on bitboards of a position that is not finished, without recursion
+        every depth has a frame on the stack, a child is entered by filling the next frame and its value is
+        handed back to the frame below when it's finished
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param depth: current depth
+        :param max_depth: maximum depth algorithm would traverse
+        :param prune: alpha-beta pruning, minimax searches every move if False
+        :return: evaluation function value for player to move, move cell index
+        """
+        layout = self.layout
+        full = layout.full
+        wins = layout.wins
+        table = self.table
+        ordering = self.ordering if prune else None
+        evaluator = self.evaluator
+        move_keys = self.move_keys
+        me_stack = self.me_stack
+        opp_stack = self.opp_stack
+        alpha_stack = self.alpha_stack
+        beta_stack = self.beta_stack
+        alpha_orig_stack = self.alpha_orig_stack
+        best_stack = self.best_stack
+        move_stack = self.move_stack
+        moves_stack = self.moves_stack
+        index_stack = self.index_stack
+        cell_stack = self.cell_stack
+        key_stack = self.key_stack
+        symmetry_stack = self.symmetry_stack
+        hashes_stack = self.hashes_stack
+        features_stack = self.features_stack
+
+        root = depth
+        me_stack[depth] = me
+        opp_stack[depth] = opp
+        alpha_stack[depth] = alpha
+        beta_stack[depth] = beta
+        hashes_stack[depth] = self.hashes
+        features_stack[depth] = self.features
+        # value of a finished child handed to the frame below, None when a new frame is entered
+        value = None
+        move = None
+        while True:
+            if value is None:
+                # enter frame
+                self.nodes += 1
+                # timed search checks its clock every 256 nodes
+                if self.deadline is not None and not self.nodes & 255:
+                    self._check_stop()
+                # control algorithm level
+                if depth > max_depth:
+                    value = 0 if evaluator is None else evaluator.value(features_stack[depth])
+                    move = 0
+                else:
+                    me = me_stack[depth]
+                    opp = opp_stack[depth]
+                    alpha = alpha_stack[depth]
+                    hashes = hashes_stack[depth]
+                    # reuse value of an already searched position(never at root, a move is needed there)
+                    key = None
+                    symmetry = 0
+                    if table is not None:
+                        if hashes is None:
+                            key, symmetry = table.key(me, opp)
+                        else:
+                            key = min(hashes)
+                            symmetry = hashes.index(key)
+                        if depth > 0:
+                            m = table.probe(key, max_depth - depth, alpha, beta_stack[depth])
+                            if m is not None:
+                                value = m
+                                move = 0
+                    if value is None:
+                        key_stack[depth] = key
+                        symmetry_stack[depth] = symmetry
+                        alpha_orig_stack[depth] = alpha
+                        empty = full ^ (me | opp)
+                        if ordering is None:
+                            moves_stack[depth] = empty
+                        else:
+                            moves_stack[depth] = ordering.order(
+                                empty, depth, table.move(key, symmetry) if table is not None else None
+                            )
+                        index_stack[depth] = 0
+                        best_stack[depth] = -2
+                        move_stack[depth] = None
+                        m = None
+            else:
+                # finished child goes back to its parent frame
+                if depth == root:
+                    return value, move
+                depth -= 1
+                m = -value
+                value = None
+
+            if value is None:
+                # search moves of the frame, m is the value of the last one if it's already known
+                me = me_stack[depth]
+                opp = opp_stack[depth]
+                alpha = alpha_stack[depth]
+                beta = beta_stack[depth]
+                best = best_stack[depth]
+                moves = moves_stack[depth]
+                index = index_stack[depth]
+                cell = cell_stack[depth]
+                entered = False
+                while True:
+                    if m is not None:
+                        if m > best:
+                            best = m
+                            move_stack[depth] = cell
+                        if prune:
+                            if best >= beta:
+                                self.cutoffs += 1
+                                if ordering is not None:
+                                    ordering.cutoff(cell, depth, max_depth - depth)
+                                break
+                            if best > alpha:
+                                alpha = best
+                        m = None
+                    if ordering is None:
+                        if not moves:
+                            break
+                        bit = moves & -moves
+                        moves ^= bit
+                        cell = bit.bit_length() - 1
+                    else:
+                        if index == len(moves):
+                            break
+                        cell = moves[index]
+                        index += 1
+                        bit = 1 << cell
+                    # only lines through the new sign can be completed
+                    if wins(me | bit, cell):
+                        m = 1
+                        self.terminals += 1
+                    elif me | opp | bit == full:
+                        m = 0
+                        self.terminals += 1
+                    elif depth >= max_depth:
+                        # child is at the horizon, its value is known without a frame
+                        self.nodes += 1
+                        if self.deadline is not None and not self.nodes & 255:
+                            self._check_stop()
+                        m = 0 if evaluator is None else -evaluator.value(
+                            evaluator.play(features_stack[depth], me, opp, cell)
+                        )
+                    else:
+                        # enter child frame
+                        alpha_stack[depth] = alpha
+                        best_stack[depth] = best
+                        moves_stack[depth] = moves
+                        index_stack[depth] = index
+                        cell_stack[depth] = cell
+                        child = depth + 1
+                        me_stack[child] = opp
+                        opp_stack[child] = me | bit
+                        alpha_stack[child] = -beta
+                        beta_stack[child] = -alpha
+                        hashes = hashes_stack[depth]
+                        hashes_stack[child] = (
+                            tuple(map(xor, hashes, move_keys[depth & 1][cell])) if hashes is not None else None
+                        )
+                        features = features_stack[depth]
+                        features_stack[child] = (
+                            evaluator.play(features, me, opp, cell) if evaluator is not None else None
+                        )
+                        depth = child
+                        entered = True
+                        break
+                if entered:
+                    continue
+
+                # all moves searched or cut off
+                move = move_stack[depth]
+                if table is not None:
+                    if best <= alpha_orig_stack[depth]:
+                        flag = UPPER
+                    elif best >= beta:
+                        flag = LOWER
+                    else:
+                        flag = EXACT
+                    table.store(key_stack[depth], max_depth - depth, best, flag, move, symmetry_stack[depth])
+                value = best
+
+
+class InstrumentedSearch(Search):
+    def __init__(self, layout, table=None, ordering=None, deadline=None, cancel=None, evaluator=None, on_enter=None,
+                 on_exit=None):
+        """
+        search that also keeps per-depth counters and calls back on every node
+        plain Search is used when instrumentation is off, so it costs nothing then
+        :param layout: board layout
+        :param table: transposition table or None
+        :param ordering: MoveOrdering or None for row-major order
+        :param deadline: time.perf_counter() value search stops at, or None
+        :param cancel: threading.Event, search stops as soon as it's set
+        :param evaluator: Evaluator of positions at the horizon, or None to score them as draws
+        :param on_enter: called with (depth, me, opp, alpha, beta) when a node is entered
+        :param on_exit: called with (depth, me, opp, value, move) when a node is left
+        """
+        super().__init__(layout, table, ordering, deadline, cancel, evaluator)
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        # counters of every depth
+        self.depths = []
+        self.max_depth_reached = 0
+        # cutoffs of root player's nodes are beta cuts(maximizer), of the opponent's nodes alpha cuts(minimizer)
+        self.alpha_cuts = 0
+        self.beta_cuts = 0
+
+    def negamax(self, me, opp, alpha, beta, depth, max_depth, prune):
+        """
+        count and report a node, then search it with Search.negamax
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param depth: current depth
+        :param max_depth: maximum depth algorithm would traverse
+        :param prune: alpha-beta pruning
+        :return: evaluation function value for player to move, move cell index
+        """
+        while len(self.depths) <= depth:
+            self.depths.append({'nodes': 0, 'cutoffs': 0, 'table_hits': 0, 'horizon': 0})
+        level = self.depths[depth]
+        level['nodes'] += 1
+        if depth > self.max_depth_reached:
+            self.max_depth_reached = depth
+        if self.on_enter is not None:
+            self.on_enter(depth, me, opp, alpha, beta)
+
+        nodes = self.nodes
+        hits = self.table.hits if self.table is not None else 0
+        m, move = super().negamax(me, opp, alpha, beta, depth, max_depth, prune)
+        if depth > max_depth:
+            level['horizon'] += 1
+        elif self.nodes == nodes + 1 and self.table is not None and self.table.hits > hits:
+            # value came from transposition table, no move was searched
+            level['table_hits'] += 1
+        elif prune and m >= beta:
+            level['cutoffs'] += 1
+            if depth & 1:
+                self.alpha_cuts += 1
+            else:
+                self.beta_cuts += 1
+
+        if self.on_exit is not None:
+            self.on_exit(depth, me, opp, m, move)
+        return m, move
+
+
+def best_move(position, side_to_move, budget=None, max_depth=None, prune=True, alpha=-2, beta=2,
+              table=None, ordering=True, cancel=None, evaluator=True, iterative=False, instrument=False, on_enter=None,
+              on_exit=None, profile=False):
+    """
+    search best move of a position without changing anything shared(unless a table or ordering is passed)
+    :param position: Position
+    :param side_to_move: X or O
+    :param budget: seconds to search with iterative deepening, or None for one search to max_depth
+    :param max_depth: maximum depth algorithm would traverse(whole tree if not given)
+    :param prune: alpha-beta pruning, minimax if False
+    :param alpha: lower bound for side_to_move(only without budget)
+    :param beta: upper bound for side_to_move(only without budget)
+    :param table: transposition table to read and fill, not thread-safe so don't share it between threads
+    :param ordering: True for new move ordering, a MoveOrdering to reuse, or None/False for row-major order
+    :param cancel: threading.Event, search stops as soon as it's set(a search without budget raises SearchAborted)
+    :param evaluator: True for the default evaluator of positions at the horizon, an Evaluator, or None/False
+                      to score them as draws(not used when the whole tree is searched)
+    :param iterative: search with an explicit stack instead of recursion(same results, not with instrumentation)
+    :param instrument: keep per-depth counters(on if a callback is given)
+    :param on_enter: called with (depth, me, opp, alpha, beta) when a node is entered
+    :param on_exit: called with (depth, me, opp, value, move) when a node is left
+    :param profile: run search under cProfile, stats['profile'] is the report
+    :return: SearchResult, see search_stats for stats
+    """
+    start = time.perf_counter()
+    layout = position.layout
+    me, opp = position.bits(side_to_move)
+    if ordering is True:
+        ordering = MoveOrdering(layout)
+    elif ordering is False:
+        ordering = None
+    elif ordering is not None:
+        ordering.clear()
+    if evaluator is True:
+        evaluator = evaluation.evaluator(layout)
+    elif evaluator is False:
+        evaluator = None
+    if instrument or on_enter is not None or on_exit is not None:
+        search = InstrumentedSearch(layout, table, ordering, evaluator=evaluator, on_enter=on_enter, on_exit=on_exit)
+    elif iterative:
+        search = IterativeSearch(layout, table, ordering, evaluator=evaluator)
+    else:
+        search = Search(layout, table, ordering, evaluator=evaluator)
+    hits = table.hits if table is not None else 0
+    misses = table.misses if table is not None else 0
+
+    # check if game is finished
+    result = layout.result(me, opp)
+    if result is not None:
+        return SearchResult(None, result, search_stats(search, None, start, hits, misses))
+    # the last empty field is (empty fields - 1) moves deeper than root
+    last_depth = bin(layout.full ^ (me | opp)).count('1') - 1
+    if max_depth is None or max_depth > last_depth:
+        max_depth = last_depth
+    # horizon isn't reached when the whole tree is searched, features would be updated for nothing
+    if budget is None and max_depth == last_depth:
+        search.evaluator = None
+
+    x_to_move = side_to_move == 'X'
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if budget is None:
+            if cancel is not None:
+                # no deadline, only cancel stops it
+                search.deadline = math.inf
+                search.cancel = cancel
+            search.set_root(me, opp, x_to_move)
+            m, move = search.negamax(me, opp, alpha, beta, 0, max_depth, prune)
+            completed_depth = max_depth
+        else:
+            # iterative deepening: one move ahead is always searched, so there's a move to return
+            search.set_root(me, opp, x_to_move)
+            m, move = search.negamax(me, opp, -2, 2, 0, 0, prune)
+            completed_depth = 0
+            search.deadline = start + budget
+            search.cancel = cancel
+            for d in range(1, max_depth + 1):
+                # a win or loss is already certain
+                if abs(m) == 1:
+                    break
+                try:
+                    # hashes of an aborted iteration aren't taken back
+                    search.set_root(me, opp, x_to_move)
+                    m, move = search.negamax(me, opp, -2, 2, 0, d, prune)
+                except SearchAborted:
+                    # results of unfinished iteration are dropped
+                    break
+                completed_depth = d
+    finally:
+        if profiler is not None:
+            profiler.disable()
+
+    stats = search_stats(search, completed_depth, start, hits, misses)
+    if profiler is not None:
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(20)
+        stats['profile'] = report.getvalue()
+    return SearchResult((move // position.size, move % position.size), m, stats)
+
+
+def analyse(position, side_to_move, max_depth=None, top=None, prune=True, table=None, ordering=True, evaluator=True):
+    """
+    exact score and principal variation of every root move(or the top best ones) in one search
+    root moves share the table, so transpositions and symmetric moves are searched once
+    :param position: Position
+    :param side_to_move: X or O
+    :param max_depth: maximum depth algorithm would traverse(whole tree if not given)
+    :param top: number of best moves to return, all moves if not given(moves tied with the top-th are included,
+                so choose sees all equally good moves)
+    :param prune: alpha-beta pruning, minimax if False
+    :param table: transposition table to read and fill, a new one if not given(principal variations are read
+                  from it)
+    :param ordering: True for new move ordering, a MoveOrdering to reuse, or None/False for row-major order
+    :param evaluator: True for the default evaluator of positions at the horizon, an Evaluator, or None/False
+                      to score them as draws(not used when the whole tree is searched)
+    :return: Analysis, moves sorted best first(ties in search order), score of the best move, see search_stats
+             for stats
+    """
+    start = time.perf_counter()
+    layout = position.layout
+    me, opp = position.bits(side_to_move)
+    if table is None:
+        table = TranspositionTable(layout)
+    if ordering is True:
+        ordering = MoveOrdering(layout)
+    elif ordering is False:
+        ordering = None
+    elif ordering is not None:
+        ordering.clear()
+    if evaluator is True:
+        evaluator = evaluation.evaluator(layout)
+    elif evaluator is False:
+        evaluator = None
+    search = Search(layout, table, ordering, evaluator=evaluator)
+    hits = table.hits
+    misses = table.misses
+
+    result = layout.result(me, opp)
+    if result is not None:
+        return Analysis([], result, search_stats(search, None, start, hits, misses))
+    last_depth = bin(layout.full ^ (me | opp)).count('1') - 1
+    if max_depth is None or max_depth > last_depth:
+        max_depth = last_depth
+    if max_depth == last_depth:
+        search.evaluator = None
+
+    x_to_move = side_to_move == 'X'
+    search.set_root(me, opp, x_to_move)
+    values = search.root_values(me, opp, max_depth, prune, top)
+    # sort is stable, tied moves stay in search order
+    values = sorted((value for value in values if value[2]), key=lambda value: -value[1])
+    if top is not None:
+        values = [value for value in values if value[1] >= values[min(top, len(values)) - 1][1]]
+    other = 'O' if x_to_move else 'X'
+    moves = []
+    for cell, m, _ in values:
+        x, y = cell // position.size, cell % position.size
+        pv = principal_variation(position.play(x, y, side_to_move), other, table, max_depth - 1, [cell])
+        moves.append(RootMove((x, y), m, pv))
+    return Analysis(moves, moves[0].score, search_stats(search, max_depth, start, hits, misses))
+
+
+def principal_variation(position, side_to_move, table, max_depth, cells=()):
+    """
+    follow best moves saved in a table from a position(ends where an entry is missing or replaced)
+    :param position: Position
+    :param side_to_move: X or O
+    :param table: transposition table a search filled
+    :param max_depth: maximum number of moves to follow
+    :param cells: cell indexes of moves that led to position, put in front of the variation
+    :return: list of (x, y)
+    """
+    size = position.size
+    layout = position.layout
+    me, opp = position.bits(side_to_move)
+    x_to_move = side_to_move == 'X'
+    cells = list(cells)
+    for _ in range(max_depth + 1):
+        if layout.result(me, opp) is not None:
+            break
+        if table.zobrist is None:
+            key, symmetry = table.key(me, opp)
+        else:
+            x_bits, o_bits = (me, opp) if x_to_move else (opp, me)
+            hashes = table.zobrist.hashes(x_bits, o_bits, x_to_move)
+            key = min(hashes)
+            symmetry = hashes.index(key)
+        cell = table.move(key, symmetry)
+        # a colliding entry of another position can point at a taken cell
+        if cell is None or (me | opp) >> cell & 1:
+            break
+        cells.append(cell)
+        me, opp = opp, me | 1 << cell
+        x_to_move = not x_to_move
+    return [(cell // size, cell % size) for cell in cells]
+
+
+def choose(moves, policy='random', rng=random):
+    """
+    pick one of the best moves of an analysis without searching again
+    :param moves: RootMoves sorted best first(Analysis.moves)
+    :param policy: 'first' for the first best move in search order, 'random' for any best move
+    :param rng: random.Random or the random module
+    :return: RootMove, None if there are no moves
+    """
+    if policy not in TIE_BREAKS:
+        raise ValueError(f'tie break must be one of {", ".join(TIE_BREAKS)}')
+    if not moves:
+        return None
+    best = [move for move in moves if move.score == moves[0].score]
+    if policy == 'first':
+        return best[0]
+    return rng.choice(best)
+
+
+def search_stats(search, completed_depth, start, hits, misses):
+    """
+    collect counters of a search(used in best_move)
+    :param search: Search or InstrumentedSearch
+    :param completed_depth: deepest max_depth finished(None if nothing was searched)
+    :param start: time.perf_counter() value search started at
+    :param hits: table hits before search
+    :param misses: table misses before search
+    :return: dict of nodes, terminals(finished games found), cutoffs, table_hits, table_misses,
+             completed_depth and elapsed seconds; with instrumentation also max_depth_reached, alpha_cuts,
+             beta_cuts and depths(nodes, cutoffs, table_hits and horizon nodes of every depth)
+    """
+    table = search.table
+    stats = {
+        'nodes': search.nodes,
+        'terminals': search.terminals,
+        'cutoffs': search.cutoffs,
+        'table_hits': table.hits - hits if table is not None else 0,
+        'table_misses': table.misses - misses if table is not None else 0,
+        'completed_depth': completed_depth,
+        'elapsed': time.perf_counter() - start,
+    }
+    if isinstance(search, InstrumentedSearch):
+        stats['max_depth_reached'] = search.max_depth_reached
+        stats['alpha_cuts'] = search.alpha_cuts
+        stats['beta_cuts'] = search.beta_cuts
+        stats['depths'] = search.depths
+    return stats
@@ -0,0 +1,333 @@
+"""
+Asyncio game server: many concurrent games over TCP, AI moves are searched in a process pool
+run: python server.py [--port 8765] [--workers 4] [--max-pending 8] [--max-queue 1024] [--move-timeout 2]
+protocol: one JSON object per line in both directions, every reply has "ok"(and "error" if it's False)
+    {"op": "new", "size": 3, "k": 3, "human": "X", "engine": "alpha-beta"}   start a game, AI moves if it starts
+                                                                              (engine is timed on boards over 3x3
+                                                                              if not given)
+    {"op": "move", "session": 1, "x": 0, "y": 2}                              human move, then AI's reply
+    {"op": "state", "session": 1}                                             board of a game
+    {"op": "close", "session": 1}                                             end a game
+game replies have session, board(rows as strings), turn, result(X, O, . for a draw or None) and the AI move
+engines are the tournament engine names(see tournament.py)
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from game import Game
+from search import Position
+from tournament import choose_move, opp_player, parse_engine
+
+# longest request line, longer ones close the connection
+MAX_LINE = 4096
+# largest board a session can have
+MAX_SIZE = 7
+# share of move_timeout a search may take, the rest is left for the process pool round trip
+SEARCH_SHARE = 0.75
+
+
+def _search(x_bits, o_bits, size, k, player, engine, budget):
+    """
+    AI move of a position(runs in a worker process)
+    :param x_bits: X mask
+    :param o_bits: O mask
+    :param size: board size
+    :param k: win length
+    :param player: player to move
+    :param engine: (algorithm, parameter)
+    :param budget: seconds the search may take
+    :return: cell index
+    """
+    return choose_move(engine, Position(x_bits, o_bits, size, k), player, None, random.Random(), budget)
+
+
+def default_engine(size, budget):
+    """
+    engine of a session that doesn't choose one: whole tree alpha-beta on 3x3, timed alpha-beta on larger boards
+    :param size: board size
+    :param budget: seconds a search may take
+    :return: engine name
+    """
+    return 'alpha-beta' if size <= 3 else f'timed:{budget:g}'
+
+
+class Session:
+    def __init__(self, game, human, engine):
+        """
+        state of one game
+        :param game: Game
+        :param human: player of the client, X or O
+        :param engine: (algorithm, parameter) of the AI
+        """
+        self.game = game
+        self.human = human
+        self.engine = engine
+        # one request of a game at a time
+        self.lock = asyncio.Lock()
+
+
+class GameServer:
+    def __init__(self, workers=None, max_pending=8, max_queue=1024, max_sessions=10000, move_timeout=2.0):
+        """
+        initialize server state, the process pool is started by serve
+        :param workers: number of search processes(cpu count if not given)
+        :param max_pending: AI searches given to the process pool at once, the others wait for a slot
+        :param max_queue: AI searches waiting for a slot, more are refused with "busy"
+        :param max_sessions: open games at once
+        :param move_timeout: seconds an AI move may take in the process pool, a random move is played after that
+                             (searches get SEARCH_SHARE of it as their time budget)
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_queue = max_queue
+        self.max_sessions = max_sessions
+        self.move_timeout = move_timeout
+        self.executor = None
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        # slots of the process pool(created by serve, inside the event loop) and searches waiting for one
+        self.slots = None
+        self.waiting = 0
+        # searches of timed out moves still running in the process pool, they keep their slots until they finish
+        self.abandoned = 0
+        # counters of the server
+        self.stats = {'connections': 0, 'requests': 0, 'searches': 0, 'timeouts': 0, 'busy': 0}
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """
+        accept connections until cancelled
+        :param host: address to listen on
+        :param port: port to listen on
+        :return:
+        """
+        self.slots = asyncio.Semaphore(self.max_pending)
+        with ProcessPoolExecutor(max_workers=self.workers) as self.executor:
+            server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+            async with server:
+                await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        """
+        serve one connection, its requests are answered in order
+        the next line isn't read before the reply is sent, so a client that doesn't read its replies
+        can't make the server queue more work
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return:
+        """
+        self.stats['connections'] += 1
+        # games of this connection are closed with it
+        owned = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # line too long or connection reset
+                    break
+                if not line:
+                    break
+                self.stats['requests'] += 1
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('request must be a JSON object')
+                    reply = await self.dispatch(request, owned)
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def dispatch(self, request, owned):
+        """
+        answer a request
+        :param request: dict
+        :param owned: session ids of the connection
+        :return: reply dict
+        """
+        op = request.get('op')
+        if op == 'new':
+            return await self.new_game(request, owned)
+        session_id = request.get('session')
+        if session_id not in owned:
+            return {'ok': False, 'error': f'unknown session {session_id}'}
+        session = self.sessions[session_id]
+        if op == 'move':
+            return await self.move(session_id, session, int(request['x']), int(request['y']))
+        if op == 'state':
+            return self.state(session_id, session)
+        if op == 'close':
+            owned.discard(session_id)
+            del self.sessions[session_id]
+            return {'ok': True, 'session': session_id}
+        return {'ok': False, 'error': f'unknown op {op}'}
+
+    async def new_game(self, request, owned):
+        """
+        start a game, AI plays the first move if it starts
+        :param request: new request
+        :param owned: session ids of the connection
+        :return: reply dict
+        """
+        if len(self.sessions) >= self.max_sessions:
+            return {'ok': False, 'error': 'too many sessions'}
+        size = int(request.get('size', 3))
+        if not 1 <= size <= MAX_SIZE:
+            raise ValueError(f'board size must be between 1 and {MAX_SIZE}')
+        human = request.get('human', 'X')
+        if human not in ('X', 'O'):
+            raise ValueError('human must be X or O')
+        engine = parse_engine(request.get('engine', default_engine(size, self.move_timeout * SEARCH_SHARE)))
+        if human != 'X' and self._busy():
+            return {'ok': False, 'error': 'busy'}
+        k = request.get('k')
+        game = Game(turn='X', size=size, k=None if k is None else int(k))
+        session_id = next(self._ids)
+        session = Session(game, human, engine)
+        self.sessions[session_id] = session
+        owned.add(session_id)
+        async with session.lock:
+            reply = await self.ai_move(session) if human != 'X' else {}
+        return self.state(session_id, session, **reply)
+
+    async def move(self, session_id, session, x, y):
+        """
+        play human move and AI's reply
+        :param session_id: id of the game
+        :param session: Session
+        :param x: coordinate
+        :param y: coordinate
+        :return: reply dict
+        """
+        async with session.lock:
+            game = session.game
+            if game.is_end() is not None:
+                return {'ok': False, 'error': 'game is finished'}
+            if game.turn != session.human:
+                return {'ok': False, 'error': 'not your turn'}
+            if not game.is_move_valid(x, y):
+                return {'ok': False, 'error': 'the move is not valid'}
+            if self._busy():
+                # refused before the move is made, so the client can send it again later
+                return {'ok': False, 'error': 'busy'}
+            game.make_move(x, y, game.turn)
+            game.turn = opp_player(game.turn)
+            reply = await self.ai_move(session) if game.is_end() is None else {}
+        return self.state(session_id, session, **reply)
+
+    async def ai_move(self, session):
+        """
+        search and play AI move in the process pool, waits for a free slot first
+        searches have a time budget below move_timeout, one that takes longer anyway is abandoned and a random move
+        is played; its worker finishes it in the background and the slot is freed only then
+        :param session: Session
+        :return: dict of the move and if it timed out
+        """
+        game = session.game
+        position = Position.from_board(game.board, game.k)
+        self.stats['searches'] += 1
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        timeout = False
+        future = None
+        try:
+            future = asyncio.wrap_future(self.executor.submit(
+                _search, position.x_bits, position.o_bits, game.size, game.k, game.turn, session.engine,
+                self.move_timeout * SEARCH_SHARE
+            ))
+            # shielded, so the search isn't cancelled with the wait and can be tracked until it finishes
+            cell = await asyncio.wait_for(asyncio.shield(future), self.move_timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            timeout = True
+            cell = choose_move(('random', None), position, game.turn, None, random)
+        finally:
+            if future is None or future.done():
+                self.slots.release()
+            else:
+                self.abandoned += 1
+                future.add_done_callback(self._release_abandoned)
+        x, y = divmod(cell, game.size)
+        game.make_move(x, y, game.turn)
+        game.turn = opp_player(game.turn)
+        return {'ai_move': [x, y], 'timeout': timeout}
+
+    def _release_abandoned(self, future):
+        """
+        free the slot of an abandoned search once its worker is done
+        :param future: asyncio.Future of the search
+        :return:
+        """
+        # nobody waits for the result, its error isn't reported either
+        if not future.cancelled():
+            future.exception()
+        self.abandoned -= 1
+        self.slots.release()
+
+    def _busy(self):
+        """
+        check if AI moves are refused because too many searches wait for the process pool
+        :return: True if busy
+        """
+        if self.waiting >= self.max_queue:
+            self.stats['busy'] += 1
+            return True
+        return False
+
+    def state(self, session_id, session, **extra):
+        """
+        reply of a game
+        :param session_id: id of the game
+        :param session: Session
+        :param extra: additional reply fields
+        :return: reply dict
+        """
+        game = session.game
+        reply = {
+            'ok': True,
+            'session': session_id,
+            'board': [''.join(row) for row in game.board],
+            'turn': game.turn,
+            'result': game.is_end(),
+        }
+        reply.update(extra)
+        return reply
+
+
+def parse_args():
+    """
+    command-line flags
+    :return: argparse namespace
+    """
+    parser = argparse.ArgumentParser(description="Tic-Tac-Toe game server")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on")
+    parser.add_argument('--workers', type=int, default=None, help="search processes(cpu count if not given)")
+    parser.add_argument('--max-pending', type=int, default=8, help="AI searches given to the process pool at once")
+    parser.add_argument('--max-queue', type=int, default=1024, help="AI searches waiting, more are refused")
+    parser.add_argument('--max-sessions', type=int, default=10000, help="open games at once")
+    parser.add_argument('--move-timeout', type=float, default=2.0, help="seconds an AI move may take")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    game_server = GameServer(args.workers, args.max_pending, args.max_queue, args.max_sessions, args.move_timeout)
+    print(f'serving on {args.host}:{args.port}')
+    try:
+        asyncio.run(game_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,216 @@
+"""
+Transposition table in shared memory, worker processes read and write the same entries without locks
+every entry is three 64 bit words: check, value and info(depth, flag, move and writer process)
+check is key ^ value ^ info, so an entry another process is writing at the same time doesn't verify
+and is treated as a miss(lockless hashing)
+"""
+import os
+import struct
+from multiprocessing import shared_memory
+
+import bitboard
+import zobrist
+from transposition import EXACT, LOWER, UPPER
+
+# number of entries at the start of the block
+HEADER = 8
+# words of an entry
+WORDS = 3
+# info of a stored entry always has this bit, an empty entry never verifies
+USED = 1 << 63
+# bits of the writer process id in info, above remaining(8), flag(2) and move(10) bits
+WRITER_BITS = 27
+
+_DOUBLE = struct.Struct('<d')
+_WORD = struct.Struct('<Q')
+
+
+def _bits(value):
+    """
+    bits of a value as a 64 bit word
+    :param value: int or float value
+    :return: int
+    """
+    return _WORD.unpack(_DOUBLE.pack(value))[0]
+
+
+def _value(bits):
+    """
+    value stored as a 64 bit word
+    :param bits: int
+    :return: value, whole numbers as ints like search returns them
+    """
+    value = _DOUBLE.unpack(_WORD.pack(bits))[0]
+    return int(value) if value.is_integer() else value
+
+
+class SharedTranspositionTable:
+    def __init__(self, layout=None, entries=1 << 20, name=None):
+        """
+        create a table in a new shared memory block, or attach to the table of another process
+        only zobrist hashing, keys are 64 bit hashes
+        :param layout: board layout of stored positions(3x3 if not given)
+        :param entries: number of entries(rounded up to a power of 2), only when a table is created
+        :param name: block of an existing table, a new table is created if not given
+        """
+        self.layout = layout if layout is not None else bitboard.layout()
+        self.zobrist = zobrist.zobrist(self.layout)
+        if name is None:
+            entries = 1 << max(entries - 1, 1).bit_length()
+            self.block = shared_memory.SharedMemory(create=True, size=HEADER + WORDS * 8 * entries)
+            _WORD.pack_into(self.block.buf, 0, entries)
+            # the creator unlinks the block when it's closed
+            self.owner = True
+        else:
+            # processes of a pool share the resource tracker of the creator
+            self.block = shared_memory.SharedMemory(name=name)
+            entries = _WORD.unpack_from(self.block.buf, 0)[0]
+            self.owner = False
+        self.name = self.block.name
+        self.max_size = entries
+        self.mask = entries - 1
+        self.words = self.block.buf[HEADER:HEADER + WORDS * 8 * entries].cast('Q')
+        # entries written by this process don't count as cross-process hits(pids fit in WRITER_BITS on Linux)
+        self.writer = os.getpid() & (1 << WRITER_BITS) - 1
+        # stores of other processes can't be collected, a persistent cache writes all entries(see cache.py)
+        self.dirty = None
+        # lookup statistics of this process
+        self.hits = 0
+        self.misses = 0
+        self.cross_hits = 0
+
+    def __len__(self):
+        return sum(1 for i in range(2, WORDS * self.max_size, WORDS) if self.words[i])
+
+    def items(self, keys=None):
+        """
+        stored entries, moves are in canonical orientation(like store with symmetry 0 takes them)
+        :param keys: only entries of these keys(missing ones are skipped), all entries if not given
+        :return: iterator of key, (remaining, value, flag, move)
+        """
+        words = self.words
+        wanted = None if keys is None else set(keys)
+        slots = range(self.max_size) if keys is None else sorted({key & self.mask for key in wanted})
+        for slot in slots:
+            i = slot * WORDS
+            check, bits, info = words[i], words[i + 1], words[i + 2]
+            key = check ^ bits ^ info
+            # an entry is verified by the index of its slot(a torn write gives another key)
+            if not info or key & self.mask != slot or (wanted is not None and key not in wanted):
+                continue
+            move = (info >> 10 & 1023) - 1
+            yield key, (info & 255, _value(bits), info >> 8 & 3, move if move >= 0 else None)
+
+    def track(self):
+        """
+        keys aren't collected, stores of other processes can't be seen(a cache writes all entries)
+        :return:
+        """
+
+    def _entry(self, key):
+        """
+        read and verify the entry of a key
+        :param key: zobrist key
+        :return: value bits, info or None if the slot holds another key(or a torn write)
+        """
+        i = (key & self.mask) * WORDS
+        words = self.words
+        check = words[i]
+        bits = words[i + 1]
+        info = words[i + 2]
+        if not info or check ^ bits ^ info != key:
+            return None
+        return bits, info
+
+    def probe(self, key, remaining, alpha, beta):
+        """
+        look up a position
+        :param key: position key
+        :param remaining: depth left to search below this position
+        :param alpha:
+        :param beta:
+        :return: value if stored entry decides this node, otherwise None
+        """
+        entry = self._entry(key)
+        if entry is not None:
+            bits, info = entry
+            # only entries searched at least as deep are usable
+            if info & 255 >= remaining:
+                flag = info >> 8 & 3
+                value = _value(bits)
+                if (
+                        flag == EXACT or
+                        (flag == LOWER and value >= beta) or
+                        (flag == UPPER and value <= alpha)
+                ):
+                    self.hits += 1
+                    if info >> 20 & (1 << WRITER_BITS) - 1 != self.writer:
+                        self.cross_hits += 1
+                    return value
+        self.misses += 1
+        return None
+
+    def move(self, key, symmetry):
+        """
+        best move saved for a position, used to search it first
+        :param key: position key
+        :param symmetry: symmetry returned with key
+        :return: move cell index or None
+        """
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        move = (entry[1] >> 10 & 1023) - 1
+        # a colliding entry of another board can hold any cell
+        if not 0 <= move < self.layout.cells:
+            return None
+        # saved move is in canonical orientation
+        return self.layout.symmetries[symmetry][move]
+
+    def store(self, key, remaining, value, flag, move=None, symmetry=0):
+        """
+        save a searched position(a deeper result of the same position is kept, any other entry is replaced)
+        :param key: position key
+        :param remaining: depth left to search below this position
+        :param value: searched value
+        :param flag: EXACT, LOWER or UPPER
+        :param move: best move cell index
+        :param symmetry: symmetry returned with key
+        :return:
+        """
+        entry = self._entry(key)
+        if entry is not None and entry[1] & 255 > remaining:
+            return
+        if move is not None:
+            move = self.layout.targets[symmetry][move]
+        info = USED | remaining | flag << 8 | (move + 1 if move is not None else 0) << 10 | self.writer << 20
+        bits = _bits(value)
+        i = (key & self.mask) * WORDS
+        words = self.words
+        words[i + 2] = info
+        words[i + 1] = bits
+        words[i] = key ^ bits ^ info
+
+    def clear(self):
+        """
+        remove all entries(of every process) and reset statistics of this process
+        :return:
+        """
+        size = WORDS * 8 * self.max_size
+        self.block.buf[HEADER:HEADER + size] = bytes(size)
+        self.hits = 0
+        self.misses = 0
+        self.cross_hits = 0
+
+    def close(self):
+        """
+        detach from the block, the creator also frees it
+        :return:
+        """
+        if self.words is None:
+            return
+        self.words.release()
+        self.words = None
+        self.block.close()
+        if self.owner:
+            self.block.unlink()
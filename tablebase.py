@@ -0,0 +1,325 @@
+"""
+Retrograde tablebase of boards up to 4x4: every position is solved backwards from finished games
+generate it once with: python tablebase.py --size 4 --k 4 --workers 4
+positions are solved a layer(number of signs on board) at a time, from the full board down to the empty one,
+every position of a layer only needs the layer above it, so a layer is split into chunks solved in parallel
+finished chunks are logged, an interrupted run continues where it stopped
+
+positions are stored from the view of the player to move(the same table serves X and O as starter):
+    record index is the base 3 number of the board(0 empty, 1 player to move, 2 the other player)
+    every record is one byte, bits 0-1: value(0 = not reachable, 1 = loss, 2 = draw, 3 = win),
+    bits 2-6: distance to result(plies)
+best moves aren't stored, a lookup reads the records of all children
+"""
+import argparse
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import combinations, islice
+
+import bitboard
+from perfect_table import LOSS, DRAW, WIN, LAYOUT, PerfectPlayTable
+
+MAGIC = b'TTB1'
+# magic, size, k, complete flag, padding
+HEADER = 8
+# records are indexed by a base 3 number and masks of the cells by a table, larger boards don't fit
+MAX_CELLS = 16
+# occupied cell sets of a layer solved by one task
+CHUNK_SIZE = 256
+
+
+def path(size, k):
+    """
+    default tablebase file of a board, next to this module
+    :param size: board size
+    :param k: win length
+    :return: file path
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f'tablebase_{size}x{size}_{k}.bin')
+
+
+@lru_cache(maxsize=None)
+def _tables(size, k):
+    """
+    lookup tables of a board shared by generation and lookups
+    :param size: board size
+    :param k: win length
+    :return: base 3 value of every mask(as player to move), masks containing a win line,
+             score of a position for every child record, record of every score
+    """
+    layout = bitboard.layout(size, k)
+    cells = layout.cells
+    if cells > MAX_CELLS:
+        raise ValueError(f'tablebase supports boards up to {MAX_CELLS} cells')
+    pow3 = [3 ** cell for cell in range(cells)]
+    base3 = [0] * (1 << cells)
+    for mask in range(1, 1 << cells):
+        low = mask & -mask
+        base3[mask] = base3[mask ^ low] + pow3[low.bit_length() - 1]
+    # every superset of a win line
+    has_line = bytearray(1 << cells)
+    for line in layout.win_masks:
+        rest = layout.full ^ line
+        sub = rest
+        while True:
+            has_line[line | sub] = 1
+            if not sub:
+                break
+            sub = (sub - 1) & rest
+    # a child worth value c at distance d is worth the opposite value at distance d + 1,
+    # scores order moves like the perfect play table: wins faster, losses and draws slower are better
+    scores = [-1] * 256
+    records = {}
+    # a child has a sign more, it's at most cells - 1 plies from its result
+    for record in range(4 * cells):
+        child = record & 3
+        if not child:
+            continue
+        value = WIN + LOSS - child
+        distance = (record >> 2) + 1
+        score = value << 5 | (31 - distance if value == WIN else distance)
+        scores[record] = score
+        records[score] = value | distance << 2
+    return base3, has_line, scores, records
+
+
+def _layer_chunks(cells, layer, chunk_size):
+    """
+    chunks of a layer
+    :param cells: number of cells
+    :param layer: number of signs on board
+    :param chunk_size: occupied cell sets of a chunk
+    :return: list of (start, stop) ranges of combinations(range(cells), layer)
+    """
+    count = 1
+    for i in range(layer):
+        count = count * (cells - i) // (i + 1)
+    return [(start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+
+
+def _solve_chunk(file, size, k, layer, start, stop):
+    """
+    solve positions of a chunk, the layer above must be solved(runs in a worker process)
+    :param file: tablebase file
+    :param size: board size
+    :param k: win length
+    :param layer: number of signs on board
+    :param start: first occupied cell set of the chunk
+    :param stop: end of the chunk
+    :return: number of solved positions
+    """
+    base3, has_line, scores, records = _tables(size, k)
+    cells = size * size
+    # player to move has as many signs as the other player or one less
+    mine = layer // 2
+    solved = 0
+    with open(file, 'r+b') as f:
+        data = mmap.mmap(f.fileno(), 0)
+        for occupied_cells in islice(combinations(range(cells), layer), start, stop):
+            bits = [1 << cell for cell in occupied_cells]
+            occupied = sum(bits)
+            # children differ from the position(seen by the next player) by a sign of the next player's opponent
+            offsets = [HEADER + 2 * 3 ** cell for cell in range(cells) if not occupied >> cell & 1]
+            for my_bits in combinations(bits, mine):
+                me = sum(my_bits)
+                opp = occupied ^ me
+                index = HEADER + base3[me] + 2 * base3[opp]
+                if has_line[opp]:
+                    # the other player has just won
+                    data[index] = LOSS
+                elif has_line[me]:
+                    # player to move would have won earlier, not reachable
+                    continue
+                elif not offsets:
+                    data[index] = DRAW
+                else:
+                    base = base3[opp] + 2 * base3[me]
+                    data[index] = records[max([scores[data[base + offset]] for offset in offsets])]
+                solved += 1
+        data.flush()
+        data.close()
+    return solved
+
+
+def generate(size=4, k=4, file=None, workers=None, chunk_size=CHUNK_SIZE, log=print):
+    """
+    solve every position of a board and write the tablebase file, an unfinished run is continued
+    :param size: board size
+    :param k: win length
+    :param file: tablebase file(default path of the board if not given)
+    :param workers: number of processes(cpu count if not given, 1 solves in this process)
+    :param chunk_size: occupied cell sets solved by one task
+    :param log: called with a progress message after every layer(None is silent)
+    :return: number of solved positions of this run
+    """
+    file = path(size, k) if file is None else file
+    cells = size * size
+    _tables(size, k)
+    records = 3 ** cells
+    if os.path.exists(file):
+        with open(file, 'rb') as f:
+            header = f.read(HEADER)
+        if header[:len(MAGIC)] != MAGIC or header[4] != size or header[5] != k:
+            raise ValueError(f'{file} is a tablebase of another board')
+        if header[6]:
+            return 0
+    else:
+        with open(file, 'wb') as f:
+            f.write(MAGIC + bytes((size, k, 0, 0)))
+            f.truncate(HEADER + records)
+    # finished chunks of earlier runs, one "layer start stop" line each
+    progress = file + '.progress'
+    done = set()
+    if os.path.exists(progress):
+        with open(progress) as f:
+            done = {tuple(map(int, line.split())) for line in f if line.strip()}
+
+    solved = 0
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    try:
+        with open(progress, 'a') as log_file:
+            for layer in range(cells, -1, -1):
+                start_time = time.perf_counter()
+                chunks = [chunk for chunk in _layer_chunks(cells, layer, chunk_size) if (layer, *chunk) not in done]
+                if executor is None:
+                    results = ((chunk, _solve_chunk(file, size, k, layer, *chunk)) for chunk in chunks)
+                else:
+                    futures = {
+                        executor.submit(_solve_chunk, file, size, k, layer, *chunk): chunk for chunk in chunks
+                    }
+                    results = ((futures[future], future.result()) for future in as_completed(futures))
+                # every chunk of the layer is finished before the layer below starts
+                for chunk, count in results:
+                    solved += count
+                    log_file.write(f'{layer} {chunk[0]} {chunk[1]}\n')
+                    log_file.flush()
+                if log is not None and chunks:
+                    log(f'layer {layer}: {len(chunks)} chunks in {time.perf_counter() - start_time:.1f}s')
+    finally:
+        # an interrupted run only waits for running chunks
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    with open(file, 'r+b') as f:
+        f.seek(6)
+        f.write(b'\x01')
+    os.remove(progress)
+    return solved
+
+
+class Tablebase:
+    def __init__(self, file):
+        """
+        memory-map a generated tablebase file
+        :param file: tablebase file
+        """
+        with open(file, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.data
+        if data[:len(MAGIC)] != MAGIC or not data[6] or len(data) != HEADER + 3 ** (data[4] * data[4]):
+            data.close()
+            raise ValueError(f'{file} is not a complete tablebase')
+        self.size = data[4]
+        self.k = data[5]
+        self.layout = bitboard.layout(self.size, self.k)
+        self.base3, _, self.scores, _ = _tables(self.size, self.k)
+
+    @classmethod
+    def load(cls, size=4, k=4, file=None):
+        """
+        load tablebase of a board if it's generated
+        :param size: board size
+        :param k: win length
+        :param file: tablebase file(default path of the board if not given)
+        :return: tablebase or None if file is missing or invalid
+        """
+        try:
+            table = cls(path(size, k) if file is None else file)
+        except (OSError, ValueError):
+            return None
+        if (table.size, table.k) != (size, k):
+            table.close()
+            return None
+        return table
+
+    def lookup(self, x_bits, o_bits, x_to_move):
+        """
+        read a position(same results as PerfectPlayTable.lookup)
+        :param x_bits: X mask
+        :param o_bits: O mask
+        :param x_to_move: True if X moves next
+        :return: value for the player to move(LOSS, DRAW or WIN), distance to result, best moves cell indexes
+                 or None if position is not reachable
+        """
+        me, opp = (x_bits, o_bits) if x_to_move else (o_bits, x_bits)
+        if opp.bit_count() - me.bit_count() not in (0, 1):
+            return None
+        base3 = self.base3
+        data = self.data
+        record = data[HEADER + base3[me] + 2 * base3[opp]]
+        if not record:
+            return None
+        value = record & 3
+        distance = record >> 2
+        if not distance:
+            return value, distance, []
+        # children with the best score
+        base = HEADER + base3[opp] + 2 * base3[me]
+        scores = self.scores
+        best = -1
+        moves = []
+        empty = self.layout.full ^ (me | opp)
+        for cell in range(self.layout.cells):
+            if empty >> cell & 1:
+                score = scores[data[base + 2 * 3 ** cell]]
+                if score > best:
+                    best = score
+                    moves = [cell]
+                elif score == best:
+                    moves.append(cell)
+        return value, distance, moves
+
+    def close(self):
+        """
+        unmap tablebase file
+        :return:
+        """
+        self.data.close()
+
+
+def load_table(layout):
+    """
+    perfect play table of a board: perfect play table on 3x3, tablebase on other boards up to 4x4
+    :param layout: board layout
+    :return: table with lookup(x_bits, o_bits, x_to_move) or None if it isn't generated
+    """
+    if layout is LAYOUT:
+        return PerfectPlayTable.load()
+    if layout.cells > MAX_CELLS:
+        return None
+    return Tablebase.load(layout.size, layout.k)
+
+
+def parse_args():
+    """
+    command-line flags
+    :return: argparse namespace
+    """
+    parser = argparse.ArgumentParser(description="retrograde tablebase generator")
+    parser.add_argument('--size', type=int, default=4, help="board size")
+    parser.add_argument('--k', type=int, default=None, help="signs in a row to win(board size if not given)")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes(cpu count if not given)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="occupied cell sets of a task")
+    parser.add_argument('--path', default=None, help="tablebase file(tablebase_<size>x<size>_<k>.bin if not given)")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    k = args.size if args.k is None else args.k
+    file = path(args.size, k) if args.path is None else args.path
+    start = time.perf_counter()
+    count = generate(args.size, k, file, workers=args.workers, chunk_size=args.chunk_size)
+    print(f'{count} positions solved in {time.perf_counter() - start:.1f}s, written to {file}')
@@ -0,0 +1,47 @@
+"""
+shared helpers of the tests, modules of the game are imported from the repository root
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bitboard  # noqa: E402
+
+
+def random_boards(size, k, count, min_moves=0, max_moves=None, seed=0):
+    """
+    boards reached by random moves that haven't finished the game, X starts
+    :param size: board size
+    :param k: win length
+    :param count: number of boards
+    :param min_moves: fewest signs on a board
+    :param max_moves: most signs on a board(all but one field if not given)
+    :param seed: seed of random moves
+    :return: list of (list of lists board, player to move)
+    """
+    rng = random.Random(seed)
+    layout = bitboard.layout(size, k)
+    max_moves = size * size - 1 if max_moves is None else max_moves
+    boards = []
+    while len(boards) < count:
+        board = [['.'] * size for _ in range(size)]
+        fields = [(i, j) for i in range(size) for j in range(size)]
+        rng.shuffle(fields)
+        moves = rng.randint(min_moves, max_moves)
+        for turn, (i, j) in enumerate(fields[:moves]):
+            board[i][j] = 'XO'[turn % 2]
+        if layout.result(*layout.from_board(board, 'X', 'O')) is None:
+            boards.append((board, 'XO'[moves % 2]))
+    return boards
+
+
+@pytest.fixture
+def boards():
+    """
+    random_boards for tests
+    """
+    return random_boards
@@ -0,0 +1,40 @@
+"""
+batch evaluation against Game
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import batch  # noqa: E402
+from game import Game  # noqa: E402
+
+RESULTS = {'X': batch.X_WINS, 'O': batch.O_WINS, '.': batch.DRAW, None: batch.ONGOING}
+
+
+@pytest.mark.parametrize('size, k', [(3, 3), (4, 4), (5, 4), (7, 5)])
+def test_status_matches_is_end(size, k):
+    rng = np.random.default_rng(size)
+    positions = rng.integers(-1, 2, size=(2000, size * size), dtype=np.int8)
+    # random signs rarely fill a board, the first positions are filled to get draws too
+    full = positions[:500]
+    empty = full == 0
+    full[empty] = rng.choice(np.array([-1, 1], dtype=np.int8), size=int(empty.sum()))
+    signs = {1: 'X', -1: 'O', 0: '.'}
+    game = Game(size=size, k=k)
+    expected = []
+    for row in positions:
+        game.board = [[signs[v] for v in row[i * size:(i + 1) * size]] for i in range(size)]
+        expected.append(RESULTS[game.is_end()])
+    assert batch.status(positions, k).tolist() == expected
+
+
+def test_from_boards_of_games(boards):
+    games = []
+    for board, _ in boards(3, 3, 50):
+        game = Game()
+        game.board = board
+        games.append(game)
+    positions = batch.from_boards(game.board for game in games)
+    assert positions.shape == (50, 9)
+    assert batch.status(positions).tolist() == [RESULTS[game.is_end()] for game in games]
+    assert batch.status(batch.from_boards([])).shape == (0,)
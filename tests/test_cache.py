@@ -0,0 +1,38 @@
+"""
+persistent cache round trip
+"""
+from cache import PositionCache
+from search import Position, best_move
+from transposition import TranspositionTable
+
+
+def test_round_trip(tmp_path):
+    position = Position.from_board([['X', '.', '.', '.']] + [['.'] * 4 for _ in range(3)], 4)
+    table = TranspositionTable(position.layout)
+    cache = PositionCache(str(tmp_path / 'positions.sqlite'))
+    cache.load(table)
+    first = best_move(position, 'O', max_depth=4, table=table)
+    assert cache.save(table) == len(table)
+    cache.close()
+
+    loaded = TranspositionTable(position.layout)
+    cache = PositionCache(str(tmp_path / 'positions.sqlite'))
+    assert cache.load(loaded) == len(table)
+    assert dict(loaded.items()) == dict(table.items())
+    # the warm table answers the same search with a lookup
+    again = best_move(position, 'O', max_depth=4, table=loaded)
+    assert (again.move, again.score) == (first.move, first.score)
+    assert again.stats['nodes'] < first.stats['nodes']
+    cache.close()
+
+
+def test_other_version_is_dropped(tmp_path):
+    position = Position.from_board([['X', '.', '.'], ['.', '.', '.'], ['.', '.', '.']])
+    table = TranspositionTable(position.layout)
+    best_move(position, 'O', table=table)
+    cache = PositionCache(str(tmp_path / 'positions.sqlite'), version='old')
+    cache.save(table)
+    cache.close()
+    cache = PositionCache(str(tmp_path / 'positions.sqlite'))
+    assert len(cache) == 0
+    cache.close()
@@ -0,0 +1,42 @@
+"""
+parallel root splitting against the serial search
+"""
+import pytest
+
+from parallel import RootSplitter
+from search import Position, best_move
+from shared_table import SharedTranspositionTable
+
+# board size, win length, number of positions, max_depth
+BOARDS = [(3, 3, 12, None), (4, 4, 6, 3), (5, 4, 4, 2)]
+
+
+@pytest.fixture(scope='module')
+def splitter():
+    splitter = RootSplitter(workers=2)
+    yield splitter
+    splitter.close()
+
+
+@pytest.mark.parametrize('size, k, count, max_depth', BOARDS)
+def test_same_move_as_serial(boards, splitter, size, k, count, max_depth):
+    for board, player in boards(size, k, count):
+        position = Position.from_board(board, k)
+        serial = best_move(position, player, max_depth=max_depth)
+        parallel = splitter.best_move(position, player, max_depth=max_depth)
+        assert parallel.move == serial.move
+        if max_depth is None:
+            assert parallel.score == serial.score
+
+
+def test_same_move_with_shared_table(boards):
+    board, player = boards(4, 4, 1, min_moves=2, seed=2)[0]
+    position = Position.from_board(board, 4)
+    table = SharedTranspositionTable(position.layout, entries=1 << 16)
+    splitter = RootSplitter(workers=2, table=table)
+    try:
+        result = splitter.best_move(position, player, max_depth=3)
+    finally:
+        splitter.close()
+        table.close()
+    assert result.move == best_move(position, player, max_depth=3).move
@@ -0,0 +1,25 @@
+"""
+perft counts of the 3x3 game tree
+"""
+import pytest
+
+pytest.importorskip('numpy')
+
+from perft import perft  # noqa: E402
+
+
+def test_perft_3x3():
+    rows = perft(3)
+    assert [row['nodes'] for row in rows] == [9, 72, 504, 3024, 15120, 54720, 148176, 200448, 127872]
+    assert sum(row['nodes'] for row in rows) == 549945
+    # reachable positions without the empty board
+    assert sum(row['unique'] for row in rows) == 5477
+    assert sum(row['x_wins'] for row in rows) == 131184
+    assert sum(row['o_wins'] for row in rows) == 77904
+    assert sum(row['draws'] for row in rows) == 46080
+
+
+def test_perft_symmetry():
+    rows = perft(3, symmetry=True)
+    # 765 positions up to rotations and reflections, with the empty board
+    assert sum(row['unique'] for row in rows) == 764
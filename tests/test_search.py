@@ -0,0 +1,98 @@
+"""
+best_move and analyse against a plain negamax on list of lists boards
+"""
+from functools import lru_cache
+
+import pytest
+
+from search import Position, analyse, best_move
+
+# board size, win length, number of positions, fewest signs on them
+BOARDS = [(3, 3, 40, 0), (3, 2, 40, 0), (4, 4, 12, 8), (4, 3, 12, 8)]
+
+
+@lru_cache(maxsize=None)
+def negamax(board, k, player):
+    """
+    value of a board for the player to move with the whole tree searched, no bitboards, table or pruning
+    :param board: tuple of rows
+    :param k: win length
+    :param player: X or O
+    :return: 1 win, 0 draw, -1 loss
+    """
+    other = 'O' if player == 'X' else 'X'
+    moves = [(i, j) for i, row in enumerate(board) for j, sign in enumerate(row) if sign == '.']
+    best = -2
+    for i, j in moves:
+        child = _play(board, i, j, player)
+        if _wins(child, k, player):
+            return 1
+        if len(moves) == 1:
+            value = 0
+        else:
+            value = -negamax(child, k, other)
+        best = max(best, value)
+    return best
+
+
+def _play(board, i, j, player):
+    """
+    board after a move
+    """
+    rows = [list(row) for row in board]
+    rows[i][j] = player
+    return tuple(map(tuple, rows))
+
+
+def _wins(board, k, player):
+    """
+    check every line of k fields of a board
+    """
+    size = len(board)
+    for i in range(size):
+        for j in range(size):
+            for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                cells = [(i + di * step, j + dj * step) for step in range(k)]
+                if all(0 <= x < size and 0 <= y < size and board[x][y] == player for x, y in cells):
+                    return True
+    return False
+
+
+def _move_value(board, k, player, move):
+    """
+    value of a move for player
+    """
+    child = _play(board, *move, player)
+    if _wins(child, k, player):
+        return 1
+    if all(sign != '.' for row in child for sign in row):
+        return 0
+    return -negamax(child, k, 'O' if player == 'X' else 'X')
+
+
+@pytest.mark.parametrize('size, k, count, min_moves', BOARDS)
+@pytest.mark.parametrize('prune', [True, False])
+def test_best_move(boards, size, k, count, min_moves, prune):
+    for board, player in boards(size, k, count, min_moves):
+        key = tuple(map(tuple, board))
+        result = best_move(Position.from_board(board, k), player, prune=prune)
+        assert result.score == negamax(key, k, player)
+        assert _move_value(key, k, player, result.move) == result.score
+
+
+@pytest.mark.parametrize('size, k, count, min_moves', BOARDS)
+def test_analyse(boards, size, k, count, min_moves):
+    for board, player in boards(size, k, count, min_moves, seed=1):
+        key = tuple(map(tuple, board))
+        analysis = analyse(Position.from_board(board, k), player)
+        empty = sum(row.count('.') for row in board)
+        assert len(analysis.moves) == empty
+        for move, score, pv in analysis.moves:
+            assert score == _move_value(key, k, player, move)
+            assert pv[0] == move
+        assert analysis.score == negamax(key, k, player)
+        # top=1 returns exactly the moves as good as the best one
+        top = analyse(Position.from_board(board, k), player, top=1)
+        assert sorted(move for move, _, _ in top.moves) == sorted(
+            move for move, score, _ in analysis.moves if score == analysis.score
+        )
@@ -0,0 +1,48 @@
+"""
+retrograde tablebase of 3x3 against the perfect play table
+"""
+import pytest
+
+import perfect_table
+import tablebase
+from perfect_table import LAYOUT, PerfectPlayTable
+
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory):
+    """
+    perfect_play.bin(generated if it's missing) and a 3x3 tablebase generated in this process
+    """
+    directory = tmp_path_factory.mktemp('tables')
+    perfect = PerfectPlayTable.load()
+    if perfect is None:
+        perfect_table.generate(str(directory / 'perfect_play.bin'))
+        perfect = PerfectPlayTable.load(str(directory / 'perfect_play.bin'))
+    file = str(directory / 'tablebase_3x3_3.bin')
+    tablebase.generate(3, 3, file=file, workers=1, log=None)
+    base = tablebase.Tablebase.load(3, 3, file=file)
+    yield perfect, base
+    perfect.close()
+    base.close()
+
+
+def test_tablebase_matches_perfect_play_table(tables):
+    perfect, base = tables
+    compared = 0
+    for index in range(3 ** LAYOUT.cells):
+        x_bits = o_bits = 0
+        for cell in range(LAYOUT.cells):
+            index, sign = divmod(index, 3)
+            if sign == 1:
+                x_bits |= 1 << cell
+            elif sign == 2:
+                o_bits |= 1 << cell
+        for x_to_move in (True, False):
+            expected = perfect.lookup(x_bits, o_bits, x_to_move)
+            if expected is None:
+                continue
+            value, distance, moves = base.lookup(x_bits, o_bits, x_to_move)
+            assert (value, distance, sorted(moves)) == (expected[0], expected[1], sorted(expected[2]))
+            compared += 1
+    # every reachable position of both starters
+    assert compared == 2 * 5478
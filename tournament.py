@@ -0,0 +1,224 @@
+"""
+Headless self-play: engines play many games against each other in a process pool
+engine names:
+    alpha-beta, alpha-beta:<max_depth>   alpha-beta search(whole tree or depth limited)
+    minimax, minimax:<max_depth>         minimax search
+    timed:<seconds>                      iterative deepening alpha-beta with a time budget per move
+    table                                perfect play table(tablebase up to 4x4, alpha-beta if it's missing)
+    mcts:<seconds>                       Monte Carlo Tree Search with a time budget per move
+    random                               random moves
+"""
+import random
+import statistics
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import bitboard
+import mcts
+from search import Position, best_move
+from tablebase import load_table
+from transposition import TranspositionTable
+
+ALGORITHMS = ('alpha-beta', 'minimax', 'timed', 'table', 'mcts', 'random')
+
+# result of one game: winner is 'A', 'B' or None for a draw, latencies are seconds per move of every engine
+GameResult = namedtuple('GameResult', ['winner', 'moves', 'latencies_a', 'latencies_b'])
+
+# perfect play tables(or tablebases) of a worker process by layout, loaded on first use
+_perfect_tables = {}
+
+
+def parse_engine(name):
+    """
+    check an engine name and split its parameter
+    :param name: engine name like alpha-beta:3
+    :return: algorithm, parameter(None if not given)
+    """
+    algorithm, _, parameter = name.partition(':')
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f'unknown engine {name}, choose from {", ".join(ALGORITHMS)}')
+    if not parameter:
+        if algorithm in ('timed', 'mcts'):
+            raise ValueError(f'{algorithm} engine needs a time budget, e.g. {algorithm}:0.1')
+        return algorithm, None
+    try:
+        return algorithm, float(parameter) if algorithm in ('timed', 'mcts') else int(parameter)
+    except ValueError:
+        kind = 'time budget' if algorithm in ('timed', 'mcts') else 'depth'
+        raise ValueError(f'{parameter!r} is not a valid {kind} of engine {name}') from None
+
+
+def choose_move(engine, position, player, table, rng, budget=None):
+    """
+    move of an engine
+    :param engine: (algorithm, parameter)
+    :param position: Position
+    :param player: player to move, X or O
+    :param table: engine's transposition table
+    :param rng: random.Random of the game
+    :param budget: seconds the search may take at most, alpha-beta and minimax deepen iteratively until it's over
+                   (not limited if not given)
+    :return: cell index
+    """
+    algorithm, parameter = engine
+    layout = position.layout
+    if algorithm == 'random':
+        empty = layout.full ^ (position.x_bits | position.o_bits)
+        return rng.choice([cell for cell in range(layout.cells) if empty >> cell & 1])
+    if algorithm == 'table':
+        if _perfect_tables.get(layout) is None:
+            _perfect_tables[layout] = load_table(layout)
+        if _perfect_tables[layout] is not None:
+            entry = _perfect_tables[layout].lookup(position.x_bits, position.o_bits, player == 'X')
+            if entry is not None and entry[2]:
+                return rng.choice(entry[2])
+    if algorithm in ('mcts', 'timed') and budget is not None:
+        parameter = min(parameter, budget)
+    if algorithm == 'mcts':
+        result = mcts.best_move(position, player, budget=parameter, seed=rng.getrandbits(32))
+    elif algorithm == 'timed':
+        result = best_move(position, player, budget=parameter, table=table)
+    else:
+        result = best_move(
+            position, player, budget=budget, max_depth=parameter, prune=algorithm != 'minimax', table=table
+        )
+    x, y = result.move
+    return x * position.size + y
+
+
+def opp_player(player):
+    """
+    the other player
+    :param player: X or O
+    :return: O or X
+    """
+    return 'O' if player == 'X' else 'X'
+
+
+def play_game(engine_a, engine_b, index, size=3, k=3, openings=1, seed=0):
+    """
+    play one game, engines switch sides every game(A is X in even games) and X starts
+    :param engine_a: (algorithm, parameter)
+    :param engine_b: (algorithm, parameter)
+    :param index: game number
+    :param size: board size
+    :param k: win length
+    :param openings: number of random moves at the start of the game
+    :param seed: tournament seed, every game has its own random moves
+    :return: GameResult
+    """
+    rng = random.Random(seed * 1000003 + index)
+    layout = bitboard.layout(size, k)
+    position = Position(0, 0, size, k)
+    players = {'X': 'A', 'O': 'B'} if index % 2 == 0 else {'X': 'B', 'O': 'A'}
+    engines = {'A': engine_a, 'B': engine_b}
+    # every engine keeps its own table during a game
+    tables = {'A': TranspositionTable(layout), 'B': TranspositionTable(layout)}
+    latencies = {'A': [], 'B': []}
+    player = 'X'
+    moves = 0
+    while True:
+        me, opp = position.bits(player)
+        result = layout.result(opp, me)
+        if result is not None:
+            # last mover has won, or it's a draw
+            winner = players[opp_player(player)] if result == 1 else None
+            return GameResult(winner, moves, latencies['A'], latencies['B'])
+        name = players[player]
+        if moves < openings:
+            move = choose_move(('random', None), position, player, None, rng)
+        else:
+            start = time.perf_counter()
+            move = choose_move(engines[name], position, player, tables[name], rng)
+            latencies[name].append(time.perf_counter() - start)
+        position = position.play(move // size, move % size, player)
+        player = opp_player(player)
+        moves += 1
+
+
+def _play_game(args):
+    """
+    unpack arguments of play_game(used by process pool)
+    :param args: play_game arguments
+    :return: GameResult
+    """
+    return play_game(*args)
+
+
+def _latency_stats(latencies):
+    """
+    summarize move times
+    :param latencies: seconds per move
+    :return: dict of moves, mean, p50, p95 and max in milliseconds
+    """
+    if not latencies:
+        return {'moves': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+    ordered = sorted(latencies)
+    return {
+        'moves': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def run_tournament(engine_a, engine_b, games=100, size=3, k=None, openings=1, seed=0, workers=None):
+    """
+    play games between two engines in a process pool
+    :param engine_a: engine name
+    :param engine_b: engine name
+    :param games: number of games
+    :param size: board size
+    :param k: win length(size if not given)
+    :param openings: number of random moves at the start of every game
+    :param seed: seed of random moves
+    :param workers: number of processes(cpu count if not given, 1 plays in this process)
+    :return: dict of results
+    """
+    k = size if k is None else k
+    a = parse_engine(engine_a)
+    b = parse_engine(engine_b)
+    jobs = [(a, b, index, size, k, openings, seed) for index in range(games)]
+    start = time.perf_counter()
+    if workers == 1:
+        results = [_play_game(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_play_game, jobs, chunksize=max(1, games // 64)))
+    elapsed = time.perf_counter() - start
+    return {
+        'engine_a': engine_a,
+        'engine_b': engine_b,
+        'board': f'{size}x{size}',
+        'k': k,
+        'games': games,
+        'a_wins': sum(1 for r in results if r.winner == 'A'),
+        'draws': sum(1 for r in results if r.winner is None),
+        'b_wins': sum(1 for r in results if r.winner == 'B'),
+        'moves': sum(r.moves for r in results),
+        'elapsed': elapsed,
+        'games_per_second': games / elapsed if elapsed else 0.0,
+        'latency_a': _latency_stats([t for r in results for t in r.latencies_a]),
+        'latency_b': _latency_stats([t for r in results for t in r.latencies_b]),
+    }
+
+
+def print_report(report):
+    """
+    print tournament results
+    :param report: dict returned by run_tournament
+    :return:
+    """
+    print(f"{report['engine_a']} vs {report['engine_b']} on {report['board']}({report['k']} in a row)")
+    print(
+        f"{report['games']} games in {report['elapsed']:.2f}s ({report['games_per_second']:.1f} games/s): "
+        f"{report['a_wins']} wins, {report['draws']} draws, {report['b_wins']} losses for {report['engine_a']}"
+    )
+    for side in ('a', 'b'):
+        latency = report[f'latency_{side}']
+        print(
+            f"{report[f'engine_{side}']}: {latency['moves']} moves, mean {latency['mean_ms']:.2f}ms, "
+            f"p50 {latency['p50_ms']:.2f}ms, p95 {latency['p95_ms']:.2f}ms, max {latency['max_ms']:.2f}ms"
+        )
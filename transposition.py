@@ -0,0 +1,138 @@
+"""
+Transposition table for minimax and alpha-beta search
+"""
+import bitboard
+import zobrist
+
+# bound flags of stored values
+EXACT = 0
+# value is a lower bound(search failed high)
+LOWER = 1
+# value is an upper bound(search failed low)
+UPPER = 2
+
+
+class TranspositionTable:
+    def __init__(self, layout=None, max_size=200000, hashing='zobrist'):
+        """
+        initialize an empty table
+        :param layout: board layout of stored positions(3x3 if not given)
+        :param max_size: maximum number of stored positions
+        :param hashing: canonical(keys are canonical masks, built at every node) or zobrist(keys are
+                        zobrist hashes search updates with every move, faster on larger boards)
+        """
+        if hashing not in ('canonical', 'zobrist'):
+            raise ValueError(f'unknown hashing {hashing}, choose canonical or zobrist')
+        self.layout = layout if layout is not None else bitboard.layout()
+        # keys of zobrist hashing, search keeps hashes of its position when it's set
+        self.zobrist = zobrist.zobrist(self.layout) if hashing == 'zobrist' else None
+        self.table = {}
+        self.max_size = max_size
+        # keys stored since the last write of a persistent cache(None when it isn't cached, see cache.py)
+        self.dirty = None
+        # lookup statistics
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def items(self, keys=None):
+        """
+        stored entries, moves are in canonical orientation(like store with symmetry 0 takes them)
+        :param keys: only entries of these keys(missing ones are skipped), all entries if not given
+        :return: iterator of key, (remaining, value, flag, move)
+        """
+        if keys is None:
+            return iter(self.table.items())
+        table = self.table
+        return ((key, table[key]) for key in keys if key in table)
+
+    def track(self):
+        """
+        start collecting keys of stored entries for a persistent cache(see cache.py)
+        :return:
+        """
+        self.dirty = set()
+
+    def key(self, me, opp):
+        """
+        build table key of a position, the same for all its rotations and reflections
+        values are saved for the player to move, so one entry serves X and O
+        (canonical hashing only, zobrist keys come from hashes search keeps)
+        :param me: mask of player to move
+        :param opp: mask of the other player
+        :return: hashable key, index of symmetry that maps position to its canonical form
+        """
+        return self.layout.canonical(me, opp)
+
+    def probe(self, key, remaining, alpha, beta):
+        """
+        look up a position
+        :param key: position key
+        :param remaining: depth left to search below this position
+        :param alpha:
+        :param beta:
+        :return: value if stored entry decides this node, otherwise None
+        """
+        entry = self.table.get(key)
+        if entry is not None:
+            depth, value, flag, _ = entry
+            # only entries searched at least as deep are usable
+            if depth >= remaining:
+                if (
+                        flag == EXACT or
+                        (flag == LOWER and value >= beta) or
+                        (flag == UPPER and value <= alpha)
+                ):
+                    self.hits += 1
+                    return value
+        self.misses += 1
+        return None
+
+    def move(self, key, symmetry):
+        """
+        best move saved for a position, used to search it first
+        :param key: position key
+        :param symmetry: symmetry returned with key
+        :return: move cell index or None
+        """
+        entry = self.table.get(key)
+        if entry is None or entry[3] is None:
+            return None
+        # saved move is in canonical orientation
+        return self.layout.symmetries[symmetry][entry[3]]
+
+    def store(self, key, remaining, value, flag, move=None, symmetry=0):
+        """
+        save a searched position(depth-preferred, oldest entry is evicted when full)
+        :param key: position key
+        :param remaining: depth left to search below this position
+        :param value: searched value
+        :param flag: EXACT, LOWER or UPPER
+        :param move: best move cell index
+        :param symmetry: symmetry returned with key
+        :return:
+        """
+        entry = self.table.get(key)
+        if entry is not None:
+            # keep deeper results
+            if entry[0] > remaining:
+                return
+        elif len(self.table) >= self.max_size:
+            # dicts keep insertion order, first key is the oldest
+            del self.table[next(iter(self.table))]
+        if move is not None:
+            move = self.layout.targets[symmetry][move]
+        self.table[key] = (remaining, value, flag, move)
+        if self.dirty is not None:
+            self.dirty.add(key)
+
+    def clear(self):
+        """
+        remove all entries and reset statistics
+        :return:
+        """
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
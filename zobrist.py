@@ -0,0 +1,90 @@
+"""
+Zobrist hashing of positions, updated with a few XORs per move instead of hashing the whole board
+every position has 8 hashes, one for each rotation/reflection, the smallest one is its symmetry-free key
+"""
+import random
+from functools import lru_cache
+from operator import xor
+
+# keys are the same in every process and run, so they can be shared and saved
+SEED = 20230122
+
+
+class Zobrist:
+    def __init__(self, layout, seed=SEED):
+        """
+        draw random 64 bit keys of every sign on every field and of the player to move
+        :param layout: board layout
+        :param seed: random seed of keys
+        """
+        self.layout = layout
+        rng = random.Random(seed)
+        # base[player][cell], player 0 is X and 1 is O
+        base = [[rng.getrandbits(64) for _ in range(layout.cells)] for _ in range(2)]
+        # toggled on every move, so X to move and O to move hash differently
+        self.side = rng.getrandbits(64)
+        # keys[player][cell][symmetry]: key of the field a cell moves to under a symmetry
+        self.keys = tuple(
+            tuple(tuple(base[player][target[cell]] for target in layout.targets) for cell in range(layout.cells))
+            for player in range(2)
+        )
+        # move_keys[player][cell][symmetry]: sign and side to move keys together, one XOR per symmetry a move
+        self.move_keys = tuple(
+            tuple(tuple(key ^ self.side for key in keys) for keys in player_keys) for player_keys in self.keys
+        )
+
+    def hashes(self, x_bits, o_bits, x_to_move):
+        """
+        hashes of a position from scratch(search updates them with play)
+        :param x_bits: X mask
+        :param o_bits: O mask
+        :param x_to_move: True if X moves next
+        :return: tuple of 8 hashes, one for every symmetry
+        """
+        hashes = (0,) * len(self.layout.targets) if x_to_move else (self.side,) * len(self.layout.targets)
+        for player, bits in enumerate((x_bits, o_bits)):
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                hashes = tuple(map(xor, hashes, self.keys[player][bit.bit_length() - 1]))
+        return hashes
+
+    def play(self, hashes, player, cell):
+        """
+        hashes after a move(the same function takes it back)
+        :param hashes: hashes of the position
+        :param player: 0 for X, 1 for O
+        :param cell: move cell index
+        :return: tuple of 8 hashes
+        """
+        return tuple(map(xor, hashes, self.move_keys[player][cell]))
+
+    @staticmethod
+    def canonical(hashes):
+        """
+        key of a position, the same for all its rotations and reflections
+        :param hashes: hashes of the position
+        :return: int, index of symmetry that maps position to its canonical form
+        """
+        key = min(hashes)
+        return key, hashes.index(key)
+
+    def key(self, x_bits, o_bits, x_to_move):
+        """
+        key of a position from scratch
+        :param x_bits: X mask
+        :param o_bits: O mask
+        :param x_to_move: True if X moves next
+        :return: int, index of symmetry that maps position to its canonical form
+        """
+        return self.canonical(self.hashes(x_bits, o_bits, x_to_move))
+
+
+@lru_cache(maxsize=None)
+def zobrist(layout):
+    """
+    shared keys of a board layout
+    :param layout: Layout
+    :return: Zobrist
+    """
+    return Zobrist(layout)